@@ -1,18 +1,41 @@
 import configparser
 import logging
 import platform
-import re
 import threading
 import time
 
 import serial
 import os
 from datetime import datetime, timedelta
-
-from matplotlib import pyplot as plt
+from typing import Optional
+
+from chart_renderer import ChartRenderer
+from checkpoint import FSYNC_ALWAYS, Checkpointer
+from log_analyzer import TEST_RESET_MARKER, TEST_RESULT_MARKER
+from log_writer import LogWriter
+from metrics import MetricAttribute, MetricsRegistry, MetricsServer
+from modem_console import PROMPT, ModemConsole, Step, TransactionResult
+from rolling_window import RollingCounter
+from serial_reader import SerialReader, Subscription
+from stream_matcher import StreamMatch, StreamMatcher
 
 #TODO: GIGA HACKS IMPLEMENTED, REFACTOR AS FAST AS POSSIBLE, WHEN 1ST VERSION WORKS
 class SerialCommunicator:
+    # Counters are kept in the metrics registry, which is safe to update from the monitor threads
+    restart_counter = MetricAttribute()
+    total_apn_tests = MetricAttribute()
+    total_radio_tests = MetricAttribute()
+    total_module_tests = MetricAttribute()
+    total_ping_tests = MetricAttribute()
+    succesful_ping_tests = MetricAttribute()
+    failed_ping_tests = MetricAttribute()
+    succesful_apn_login_test = MetricAttribute()
+    failed_apn_login_test = MetricAttribute()
+    succesful_radio_change_test = MetricAttribute()
+    failed_radio_change_test = MetricAttribute()
+    succesful_module_change_test = MetricAttribute()
+    failed_module_change_test = MetricAttribute()
+
     def __init__(self, config_file: str = 'config_file.txt', log_dir: str = 'logs') -> None:
         self.start_day = datetime.now()
         self.config_file = config_file
@@ -33,6 +56,16 @@ class SerialCommunicator:
         self.port = config.get(config_section, 'port')
         self.baudrate = config.getint(config_section, 'baudrate')
         self.timeout = config.getfloat(config_section, 'timeout')
+        self.metrics_port = config.getint(config_section, 'metrics_port', fallback=9105)
+        self.login_ttl = config.getfloat(config_section, 'login_ttl', fallback=600)
+        # Serial log rotation: segment size in MB (0 = daily only) and rotated segments to keep (0 = all)
+        self.log_max_mb = config.getfloat(config_section, 'log_max_mb', fallback=50)
+        self.log_keep_segments = config.getint(config_section, 'log_keep_segments', fallback=0)
+        # Checkpoints of the campaign statistics: file (default next to the log), save interval and fsync policy;
+        # an interval of 0 (or less) saves only on exit
+        self.checkpoint_file = config.get(config_section, 'checkpoint_file', fallback='')
+        self.checkpoint_interval = max(0.0, config.getfloat(config_section, 'checkpoint_interval', fallback=60))
+        self.checkpoint_fsync = config.get(config_section, 'checkpoint_fsync', fallback=FSYNC_ALWAYS)
 
         self.log_dir = log_dir
         if not os.path.exists(self.log_dir):
@@ -40,10 +73,27 @@ class SerialCommunicator:
 
         sanitized_port = self.port.replace("/", "_").replace(":", "_")
         self.log_file = os.path.join(self.log_dir, f'serial_log_{sanitized_port}.txt')
+        if not self.checkpoint_file:
+            self.checkpoint_file = os.path.join(self.log_dir, f'checkpoint_{sanitized_port}.json')
+        # Disk I/O happens on the writer thread, never on the serial reader; rotated segments are gzipped
+        self.log_writer = LogWriter(self.log_file, max_bytes=int(self.log_max_mb * 1024 * 1024),
+                                    keep_segments=self.log_keep_segments)
+        self.log_writer.start()
+        # Charts are drawn by a separate process, only when their numbers change
+        self.charts = ChartRenderer(self.log_dir)
+
+        self._init_metrics()
 
         self.lock = threading.Lock()
-        self.ser = None
+        # Unfinished line at the end of the last chunk, completed by the next one
+        self._partial_line = ""
+        # Single reader thread owns the port; monitors consume its chunks through subscriptions
+        self.reader = SerialReader(self.port, self.baudrate, self.timeout, on_data=self._log_data)
+        self._pending_subscriptions = {}
+        # Console transactions reuse the admin session until it expires or the modem restarts
+        self.console = ModemConsole(self.reader, self._write, self.password, self.login_ttl)
         self._connect_serial()
+        self.reader.start()
         self.start_date = datetime.now().date()
         # Uptime tracking
         self.total_uptime = timedelta(0)
@@ -56,101 +106,164 @@ class SerialCommunicator:
         self.radio_change_interval = 60 # Change interval in seconds (3 hours)
         self.ping_interval = 5 * 60
 
-        self.restart_counter = 0
-        # Test tracking
-        self.total_apn_tests = 0
-        self.total_radio_tests = 0
-        self.total_module_tests = 0
-        self.total_ping_tests = 0
-
-        # Successful/failed test tracking
-        self.succesful_ping_tests = 0
-        self.failed_ping_tests = 0
-        self.succesful_apn_login_test = 0
-        self.failed_apn_login_test = 0
-        self.succesful_radio_change_test = 0
-        self.failed_radio_change_test = 0
-        self.succesful_module_change_test = 0
-        self.failed_module_change_test = 0
 
-        # Daily tracking arrays
-        self.daily_failed_radio_change_test = [0] * 7
-        self.daily_successful_radio_change_test = [0] * 7
+        # Daily tracking, one bucket per local day for the last week
+        self.daily_failed_radio_change_test = RollingCounter('day', 7)
+        self.daily_successful_radio_change_test = RollingCounter('day', 7)
 
 
-        self.daily_failed_module_change_test = [0] * 7
-        self.daily_successful_module_change_test = [0] * 7
+        self.daily_failed_module_change_test = RollingCounter('day', 7)
+        self.daily_successful_module_change_test = RollingCounter('day', 7)
 
-        self.daily_successful_apn_login_tests = [0] * 7
-        self.daily_failed_apn_login_tests = [0] * 7
+        self.daily_successful_apn_login_tests = RollingCounter('day', 7)
+        self.daily_failed_apn_login_tests = RollingCounter('day', 7)
 
-        self.daily_successful_ping_tests = [0] * 7
-        self.daily_failed_ping_tests = [0] * 7
+        self.daily_successful_ping_tests = RollingCounter('day', 7)
+        self.daily_failed_ping_tests = RollingCounter('day', 7)
         # Time of last test for hourly update
         self.last_test_hour = datetime.now().hour
 
-    def _connect_serial(self):
-        """Attempts to connect to the serial port."""
-        try:
-            self.ser = serial.Serial(self.port, baudrate=self.baudrate, timeout=self.timeout)
-            logging.info(f"Connected to {self.port}")
-        except serial.SerialException as e:
-            logging.error(f"Failed to connect to {self.port}: {e}")
-            self.ser = None
-
-    def wait_for_message(self, expected_message: str, timeout: int = 45) -> bool:
-        start_time = time.time()
-        buffer = ""
-        unknown_command_pattern = re.compile(r"nieznane polecenie '([^']+)'")
-
-        while True:
-            if time.time() - start_time > timeout:
-                return False
-
-            if self.ser.in_waiting > 0:
-                data = self.read()
-                buffer += data
-
-                match = unknown_command_pattern.search(buffer)
-                if match:
-                    command = match.group(1)
-                    message = f"Skipping test due to unknown command: 'nieznane polecenie {command}'"
-                    logging.warning(message)
-
-                # Check if the expected message is found
-                if expected_message in buffer:
-                    return True
-
-    def wait_for_message_and_take_value(self, expected_message: str, timeout: int = 30) -> str:
-        start_time = time.time()
-        buffer = ""
-
-        while time.time() - start_time < timeout:
-            if self.ser.in_waiting > 0:
-                data = self.ser.read(self.ser.in_waiting).decode()  # Read all available data
-                buffer += data
+        # A crash or reboot resumes the campaign from the last checkpoint instead of starting from zero
+        self.checkpointer = Checkpointer(self.checkpoint_file, self.checkpoint_fsync)
+        self._restore_checkpoint()
+
+    def _init_metrics(self) -> None:
+        """Registers the test counters and, unless metrics_port is 0, serves them in Prometheus format."""
+        self.metrics = MetricsRegistry()
+        self._metrics = {
+            'restart_counter': self.metrics.gauge('modem_restarts', "Modem restarts not caused by a test"),
+        }
+        for test, successful, failed in (('ping', 'succesful_ping_tests', 'failed_ping_tests'),
+                                         ('apn', 'succesful_apn_login_test', 'failed_apn_login_test'),
+                                         ('radio', 'succesful_radio_change_test', 'failed_radio_change_test'),
+                                         ('module', 'succesful_module_change_test', 'failed_module_change_test')):
+            self._metrics[f'total_{test}_tests'] = self.metrics.counter(
+                'modem_tests_started_total', "Tests sent to the modem", {'test': test})
+            self._metrics[successful] = self.metrics.counter(
+                'modem_tests_total', "Finished tests by result", {'test': test, 'result': 'successful'})
+            self._metrics[failed] = self.metrics.counter(
+                'modem_tests_total', "Finished tests by result", {'test': test, 'result': 'failed'})
+        self.modem_up_gauge = self.metrics.gauge('modem_up', "1 while the modem is up, 0 during a restart")
+        self.modem_up_gauge.set(1)
+        self.uptime_gauge = self.metrics.gauge('modem_uptime_percent', "Uptime since the program started")
+        self.ping_reply_seconds = self.metrics.histogram('modem_ping_reply_seconds', "Time until the ping reply",
+                                                         buckets=(0.5, 1, 2, 5, 10, 20, 30))
+        self.received_chars = self.metrics.counter('serial_received_chars_total', "Characters read from the port")
+
+        self.metrics_server = None
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port=self.metrics_port)
+                self.metrics_server.start()
+            except OSError as e:
+                logging.error(f"Could not serve metrics on port {self.metrics_port}: {e}")
+                self.metrics_server = None
 
-                if expected_message in buffer:
-                    return buffer
+    def _count(self, name: str, amount: int = 1) -> None:
+        self._metrics[name].inc(amount)
 
-            time.sleep(0.1)  # Small delay to allow data to accumulate
+    @property
+    def ser(self):
+        return self.reader.ser
 
-        return ""  # Return an empty string if message not found within timeout
+    def _connect_serial(self):
+        """Attempts to connect to the serial port."""
+        self.reader.connect()
+
+    def _write(self, data: bytes) -> None:
+        if self.ser is None:
+            raise serial.SerialException(f"{self.port} is not open")
+        self.ser.write(data)
+
+    def subscribe(self) -> Subscription:
+        """Returns a new subscription to everything the reader receives from now on."""
+        return self.reader.subscribe()
+
+    def _open_pending_subscription(self, name: str) -> None:
+        """Subscribes before a command is sent, so the matching monitor cannot miss its reply."""
+        previous = self._pending_subscriptions.pop(name, None)
+        if previous:
+            previous.close()
+        self._pending_subscriptions[name] = self.subscribe()
+
+    def _take_pending_subscription(self, name: str) -> Subscription:
+        subscription = self._pending_subscriptions.pop(name, None)
+        return subscription if subscription else self.subscribe()
+
+    def checkpoint_state(self) -> dict:
+        """The campaign statistics that survive a restart: counters, daily results and uptime."""
+        uptime = self.total_uptime
+        if self.is_modem_up and self.uptime_start_time:
+            uptime += datetime.now() - self.uptime_start_time
+        return {
+            'counters': {name: metric.value for name, metric in self._metrics.items()},
+            'daily': {name: counter.buckets() for name, counter in vars(self).items()
+                      if isinstance(counter, RollingCounter)},
+            'total_uptime': uptime.total_seconds(),
+            'program_start_time': self.program_start_time.timestamp(),
+        }
+
+    def save_checkpoint(self) -> bool:
+        return self.checkpointer.save(self.checkpoint_state())
+
+    def _restore_checkpoint(self) -> None:
+        """Resumes the statistics from the last checkpoint; the time since it was saved counts as downtime."""
+        state = self.checkpointer.load()
+        if state is None:
+            return
+        for name, value in state['counters'].items():
+            if name in self._metrics:
+                self._metrics[name].set(value)
+        for name, buckets in state['daily'].items():
+            counter = getattr(self, name, None)
+            if isinstance(counter, RollingCounter):
+                for start, count in buckets:
+                    if count:
+                        counter.add(count, start)
+        # Uptime only grows while the program runs, so the offline gap lowers the percentage
+        self.total_uptime = timedelta(seconds=state['total_uptime'])
+        self.program_start_time = datetime.fromtimestamp(state['program_start_time'])
+        gap = time.time() - state['saved_at']
+        logging.info(f"Resumed statistics from {self.checkpoint_file}, {gap:.0f} s offline counted as downtime")
+        self.log_writer.write(f"Resumed from checkpoint, {gap:.0f} s offline counted as downtime")
+
+    def close(self) -> None:
+        """Saves a final checkpoint, stops the reader thread, closes the serial connection and flushes the log."""
+        self.save_checkpoint()
+        self.reader.stop()
+        if self._partial_line:
+            self._log_entry(self._partial_line, time.time())
+            self._partial_line = ""
+        self.log_writer.close()
+        self.charts.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+
+    def wait_for_message(self, expected_message: str, timeout: int = 45,
+                         subscription: Subscription = None) -> bool:
+        if subscription is None:
+            with self.subscribe() as subscription:
+                return self.wait_for_message(expected_message, timeout, subscription)
+
+        # Check if the expected message is found; unknown-command notices are logged on the way
+        return self.console.expect(subscription, expected_message, timeout, stop_on_unknown=False) is not None
+
+    def wait_for_message_and_take_value(self, expected_message: str, timeout: int = 30,
+                                        subscription: Subscription = None) -> str:
+        if subscription is None:
+            with self.subscribe() as subscription:
+                return self.wait_for_message_and_take_value(expected_message, timeout, subscription)
+
+        found, buffer = subscription.wait_for(lambda buffer: expected_message in buffer, timeout)
+        return buffer if found else ""  # Return an empty string if message not found within timeout
 
     def is_debug_mode(self) -> bool:
-        self.ser.write(b'\n\r')
-        if not self.wait_for_message("debug >", 3):
-            return False
-        else:
-            return True
+        return self.console.is_debug_mode()
 
     def login_admin(self) -> bool:
-        if self.is_debug_mode():
-            return False
-        self.ser.write('login\n'.encode())
-        self.ser.write(f'{self.password}\r\n'.encode())
-
-        if self.wait_for_message("LCT: OK logged in"):
+        """Makes sure an admin session is open, reusing the cached one when it is still valid."""
+        logged_in = self.console.login()
+        if logged_in:
             print("Login: OK")
             return True
         else:
@@ -161,26 +274,22 @@ class SerialCommunicator:
     def _is_unwanted_entry(entry: str) -> bool:
         return entry == "" or entry.startswith("debug >")
 
-    def read(self) -> str:
-        try:
-            if self.ser and self.ser.in_waiting > 0:
-                data = self.ser.read(self.ser.in_waiting or 1).decode('utf-8')
-                self._log_data(data)
-                return data
-        except serial.SerialException as e:
-            logging.error(f"Disconnected from {self.port}: {e}")
-            logging.info(f"Attempting to reconnect to {self.port}...")
-            self.ser = None
-        return ""
-
     def _log_data(self, data: str) -> None:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        log_entries = data.splitlines()
-        with open(self.log_file, 'a') as f:
-            for entry in log_entries:
-                entry = entry.strip()
-                if entry and not self._is_unwanted_entry(entry):
-                    f.write(f"{timestamp} - {entry}\n")
+        timestamp = time.time()
+        self.received_chars.inc(len(data))
+        log_entries = (self._partial_line + data).split('\n')
+        self._partial_line = log_entries.pop()
+        if self._partial_line.strip() == PROMPT:
+            # The prompt is never followed by a newline and is not logged; don't glue it to the next reply
+            self._partial_line = ""
+        for entry in log_entries:
+            self._log_entry(entry, timestamp)
+
+    def _log_entry(self, entry: str, timestamp: float) -> None:
+        for part in entry.splitlines():
+            part = part.strip()
+            if part and not self._is_unwanted_entry(part):
+                self.log_writer.write(part, timestamp)
 
     def calculate_uptime_percentage(self):
         """Calculates the uptime percentage and logs it every 5 minutes."""
@@ -196,128 +305,122 @@ class SerialCommunicator:
         uptime_percentage = (self.total_uptime / total_time) * 100 if total_time.total_seconds() > 0 else 0
 
         logging.info(f"Uptime percentage: {uptime_percentage:.2f}%")
+        self.uptime_gauge.set(uptime_percentage)
 
         # Log the uptime percentage to a file with timestamp
-        with open(self.log_file, 'a') as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} - Uptime percentage: "
-                    f"{uptime_percentage:.2f}%\n")
+        self.log_writer.write(f"Uptime percentage: {uptime_percentage:.2f}%")
 
     def monitor_modem_restart(self) -> None:
         """Monitors the serial port continuously for modem restart messages and tracks uptime and restarts."""
-        buffer = ""
-
-        while True:
-            if self.ser is None:
-                self._connect_serial()
-
-            if self.ser and self.ser.in_waiting > 0:
-                data = self.read()
-                buffer += data
-
-                if re.search(r" Restart w ciagu 3 s", buffer):
-                    self.restart_counter += 1  # Increment restart counter
-                    logging.info(f"Modem restarts: {self.restart_counter}")
-                    buffer = ""
-                    if self.is_modem_up and self.uptime_start_time:
-                        downtime_start = datetime.now()
-                        self.total_uptime += downtime_start - self.uptime_start_time  # Track downtime
-                    self.is_modem_up = False
-                    self.last_restart_time = datetime.now()
-                    self.uptime_start_time = None
-
-                if re.search(r"Modul radiowy poprawnie wykryty i zainicjowany", buffer):
-                    logging.info("Modem has successfully restarted.")
-                    self.is_modem_up = True
-                    self.uptime_start_time = datetime.now()
-                    buffer = ""
-
-            time.sleep(1)
+        matcher = StreamMatcher()
+        matcher.register('restart', " Restart w ciagu 3 s", self._on_modem_restart)
+        matcher.register('restarted', "Modul radiowy poprawnie wykryty i zainicjowany", self._on_modem_restarted)
+        subscription = self.subscribe()
+
+        while self.reader.is_alive():
+            data = subscription.get(timeout=self.timeout)  # Wakes as soon as the reader publishes
+            if data:
+                matcher.feed(data)
+
+        subscription.close()
+
+    def _on_modem_restart(self, match: StreamMatch) -> None:
+        self._count('restart_counter')
+        self.console.invalidate_login()  # A restart ends the admin session
+        logging.info(f"Modem restarts: {self.restart_counter}")
+        if self.is_modem_up and self.uptime_start_time:
+            downtime_start = datetime.now()
+            self.total_uptime += downtime_start - self.uptime_start_time  # Track downtime
+        self.is_modem_up = False
+        self.modem_up_gauge.set(0)
+        self.last_restart_time = datetime.now()
+        self.uptime_start_time = None
+
+    def _on_modem_restarted(self, match: StreamMatch) -> None:
+        logging.info("Modem has successfully restarted.")
+        self.is_modem_up = True
+        self.modem_up_gauge.set(1)
+        self.uptime_start_time = datetime.now()
 
     def monitor_ping_calls(self) -> None:
         """Monitors for a ping response with a 30-second timeout."""
-        buffer = ""
-        end_time = datetime.now() + timedelta(seconds=30)  # 30-second timeout
-        ping_successful = False  # Flag to track if ping was successful
-
-        while datetime.now() < end_time:
-            if self.ser and self.ser.in_waiting > 0:
-                data = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
-                buffer += data
-                logging.debug(f"Buffer updated: {buffer}")
-
-                if "recv from 8.8.8.8:" in buffer:
-                    logging.info("Ping test successful.")
-                    self._increment_ping_test_count(success=True)
-                    ping_successful = True  # Mark as successful
-                    break  # Exit loop after success
-
-            time.sleep(0.1)
+        subscription = self._take_pending_subscription('ping')
+        matcher = StreamMatcher().register('ping_reply', "recv from 8.8.8.8:")
+        # Blocks until the reply arrives or the 30-second timeout expires
+        started = time.monotonic()
+        ping_successful = subscription.wait_for_match(matcher, 30) is not None
+        if ping_successful:
+            self.ping_reply_seconds.observe(time.monotonic() - started)
+        subscription.close()
+
+        if ping_successful:
+            logging.info("Ping test successful.")
+            self._increment_ping_test_count(success=True)
 
         # Only increment as failed if no success was recorded
         if not ping_successful:
             logging.info("Ping test failed (timeout).")
             self._increment_ping_test_count(success=False)
 
+    def _log_test_result(self, test: str, success: bool) -> None:
+        # Markers in the serial log let log_analyzer.py rebuild the counters offline
+        self.log_writer.write(f"{TEST_RESULT_MARKER} {test} {'successful' if success else 'failed'}")
+
+    def _discount_test_restart(self, test: str) -> None:
+        """The reset sent by a change test is not a modem failure, so it is taken off the restart count."""
+        self._count('restart_counter', -1)
+        self.log_writer.write(f"{TEST_RESET_MARKER} {test}")
+
     def _increment_ping_test_count(self, success: bool) -> None:
-        """Increments the daily test count, accounting for day transitions."""
-        current_day = (datetime.now().date() - self.start_date).days % 7  # Rolling 7-day index
+        """Increments the test count for today; buckets older than a week expire on their own."""
+        self._log_test_result('ping', success)
         if success:
-            self.daily_successful_ping_tests[current_day] += 1
-            self.succesful_ping_tests += 1
+            self.daily_successful_ping_tests.add()
+            self._count('succesful_ping_tests')
         else:
-            self.daily_failed_ping_tests[current_day] += 1
-            self.failed_ping_tests += 1
+            self.daily_failed_ping_tests.add()
+            self._count('failed_ping_tests')
 
     def _increment_module_test_count(self, success: bool) -> None:
-        """Increments the daily test count, accounting for day transitions."""
-        current_day = (datetime.now().date() - self.start_date).days % 7  # Rolling 7-day index
+        """Increments the test count for today; buckets older than a week expire on their own."""
+        self._log_test_result('module', success)
         if success:
-            self.daily_successful_module_change_test[current_day] += 1
-            self.succesful_module_change_test += 1
+            self.daily_successful_module_change_test.add()
+            self._count('succesful_module_change_test')
         else:
-            self.daily_failed_module_change_test[current_day] += 1
-            self.failed_module_change_test += 1
+            self.daily_failed_module_change_test.add()
+            self._count('failed_module_change_test')
 
     def _increment_radio_test_count(self, success: bool) -> None:
-        """Increments the daily test count, accounting for day transitions."""
-        current_day = (datetime.now().date() - self.start_date).days % 7  # Rolling 7-day index
+        """Increments the test count for today; buckets older than a week expire on their own."""
+        self._log_test_result('radio', success)
         if success:
-            self.daily_successful_radio_change_test[current_day] += 1
-            self.succesful_radio_change_test += 1
+            self.daily_successful_radio_change_test.add()
+            self._count('succesful_radio_change_test')
         else:
-            self.daily_failed_radio_change_test[current_day] += 1
-            self.failed_radio_change_test +=1
+            self.daily_failed_radio_change_test.add()
+            self._count('failed_radio_change_test')
 
     def monitor_module_change(self) -> None:
         retry_count = 0
         max_retries = 2
         while retry_count <= max_retries:
-            time.sleep(3)
-            buffer = ""
-            end_time = datetime.now() + timedelta(seconds=40)
-            module_change_successful = False  # Flag to track if module change was successful
-
-            while datetime.now() < end_time:
-                if self.ser and self.ser.in_waiting > 0:
-                    data = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    logging.debug(f"Buffer updated: {buffer}")
-
-                    # Check for module change success in the buffer
-                    if "N27" in buffer or "N717" in buffer:
-                        logging.info("Module change successful.")
-                        module_change_successful = True  # Mark as successful
-                        self._increment_module_test_count(success=True)
-                        self.restart_counter -= 1
-                        break  # Exit the loop if success message is found
-
-                time.sleep(1)  # Sleep to prevent high CPU usage
+            subscription = self._take_pending_subscription('module')
+            matcher = StreamMatcher().register('module', "N27").register('module', "N717")
+            # Check for module change success in the stream, waking on every chunk for up to 40 s
+            match = subscription.wait_for_match(matcher, 40)
+            subscription.close()
+            module_change_successful = match is not None
+            logging.debug(f"Module change match: {match}")
 
             if module_change_successful:
+                logging.info("Module change successful.")
+                self._increment_module_test_count(success=True)
+                self._discount_test_restart('module')
                 break  # Exit the retry loop if the module change is successful
             else:
                 retry_count += 1  # Increment the retry count
-                self.restart_counter -= 1
+                self._discount_test_restart('module')
                 # If we have reached the max retries, stop and log failure
                 if retry_count > max_retries:
                     logging.error("Module change failed after 2 retries.")
@@ -331,32 +434,22 @@ class SerialCommunicator:
         retry_count = 0
         max_retries = 2
         while retry_count <= max_retries:
-            time.sleep(3)
-            buffer = ""
-            end_time = datetime.now() + timedelta(seconds=40)
-            radio_change_successful = False  # Flag to track if radio change was successful
-
-            while datetime.now() < end_time:
-                if self.ser and self.ser.in_waiting > 0:
-                    data = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    logging.debug(f"Buffer updated: {buffer}")
-
-                    # Check for radio change success in the buffer
-                    if "RAT: LTE" in buffer or "RAT: EDGE" in buffer:
-                        logging.info("Radio change successful.")
-                        self._increment_radio_test_count(success=True)
-                        self.restart_counter -= 1
-                        radio_change_successful = True  # Mark as successful
-                        break  # Exit the loop if success message is found
-
-                time.sleep(1)  # Sleep to prevent high CPU usage
+            subscription = self._take_pending_subscription('radio')
+            matcher = StreamMatcher().register('radio', "RAT: LTE").register('radio', "RAT: EDGE")
+            # Check for radio change success in the stream, waking on every chunk for up to 40 s
+            match = subscription.wait_for_match(matcher, 40)
+            subscription.close()
+            radio_change_successful = match is not None
+            logging.debug(f"Radio change match: {match}")
 
             if radio_change_successful:
+                logging.info("Radio change successful.")
+                self._increment_radio_test_count(success=True)
+                self._discount_test_restart('radio')
                 break  # Exit the retry loop if the radio change is successful
             else:
                 retry_count += 1  # Increment the retry count
-                self.restart_counter -= 1
+                self._discount_test_restart('radio')
 
                 # If we have reached the max retries, stop and log failure
                 if retry_count > max_retries:
@@ -368,310 +461,127 @@ class SerialCommunicator:
 
     def plot_daily_radio_test_results(self) -> None:
         """Plots the test results as a pie chart."""
-
-        total_positive =  self.succesful_radio_change_test
-        total_negative =  self.failed_radio_change_test
-
-        labels = []
-        sizes = []
-        colors = []
-
-        if total_positive > 0:
-            labels.append('Successful Tests')
-            sizes.append(total_positive)
-            colors.append('green')
-        if total_negative > 0:
-            labels.append('Failed Tests')
-            sizes.append(total_negative)
-            colors.append('red')
-
-        if not sizes:
-            sizes = [1]
-            labels = ['No Tests']
-            colors = ['grey']
-
         date_str = datetime.now().strftime('%Y-%m-%d')
-
-        # Custom function to format labels
-        def func(pct, allvals):
-            absolute = int(round(pct / 100. * sum(allvals)))
-            return f'{absolute} ({pct:.1f}%)'
-
-        # Plotting
-        plt.figure(figsize=(8, 8))
-        wedges, texts, autotexts = plt.pie(sizes, labels=labels, autopct=lambda pct: func(pct, sizes),
-                                           colors=colors, shadow=False, startangle=90)
-        plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        plt.title(f'Radio Test Results - {date_str}')
-
-        # Improve label visibility
-        for text in autotexts:
-            text.set_color('white')
-            text.set_fontsize(12)
-
-        timestamp = datetime.now().strftime('%Y-%m-%d')  # Format for the filename
-        plt.savefig(os.path.join(self.log_dir, f'radio_change_test_results_{timestamp}.png'))
-        plt.close()
+        self.charts.submit('pie', f'radio_change_test_results_{date_str}.png',
+                           title=f'Radio Test Results - {date_str}',
+                           total_positive=self.succesful_radio_change_test,
+                           total_negative=self.failed_radio_change_test)
 
     def plot_daily_ping_test_results(self) -> None:
         """Plots the test results as a pie chart."""
-
-        total_positive = self.succesful_ping_tests
-        total_negative = self.failed_ping_tests
-
-        labels = []
-        sizes = []
-        colors = []
-
-        if total_positive > 0:
-            labels.append('Successful Tests')
-            sizes.append(total_positive)
-            colors.append('green')
-        if total_negative > 0:
-            labels.append('Failed Tests')
-            sizes.append(total_negative)
-            colors.append('red')
-
-        if not sizes:
-            sizes = [1]
-            labels = ['No Tests']
-            colors = ['grey']
-
         date_str = datetime.now().strftime('%Y-%m-%d')
-
-        # Custom function to format labels
-        def func(pct, allvals):
-            absolute = int(round(pct / 100. * sum(allvals)))
-            return f'{absolute} ({pct:.1f}%)'
-
-        # Plotting
-        plt.figure(figsize=(8, 8))
-        wedges, texts, autotexts = plt.pie(sizes, labels=labels, autopct=lambda pct: func(pct, sizes),
-                                           colors=colors, shadow=False, startangle=90)
-        plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        plt.title(f'Ping Test Results - {date_str}')
-
-        # Improve label visibility
-        for text in autotexts:
-            text.set_color('white')
-            text.set_fontsize(12)
-
-        timestamp = datetime.now().strftime('%Y-%m-%d')  # Format for the filename
-        plt.savefig(os.path.join(self.log_dir, f'ping_test_results_{timestamp}.png'))
-        plt.close()  # Close the figure to free up memory
+        self.charts.submit('pie', f'ping_test_results_{date_str}.png',
+                           title=f'Ping Test Results - {date_str}',
+                           total_positive=self.succesful_ping_tests,
+                           total_negative=self.failed_ping_tests)
 
     def plot_daily_module_change_test_results(self) -> None:
         """Plots the test results as a pie chart."""
-
-        total_positive = self.succesful_module_change_test
-        total_negative = self.failed_module_change_test
-
-        labels = []
-        sizes = []
-        colors = []
-
-        if total_positive > 0:
-            labels.append('Successful Tests')
-            sizes.append(total_positive)
-            colors.append('green')
-        if total_negative > 0:
-            labels.append('Failed Tests')
-            sizes.append(total_negative)
-            colors.append('red')
-
-        if not sizes:
-            sizes = [1]
-            labels = ['No Tests']
-            colors = ['grey']
-
         date_str = datetime.now().strftime('%Y-%m-%d')
+        self.charts.submit('pie', f'module_change_test_results_{date_str}.png',
+                           title=f'Module Test Results - {date_str}',
+                           total_positive=self.succesful_module_change_test,
+                           total_negative=self.failed_module_change_test)
 
-        # Custom function to format labels
-        def func(pct, allvals):
-            absolute = int(round(pct / 100. * sum(allvals)))
-            return f'{absolute} ({pct:.1f}%)'
-
-        # Plotting
-        plt.figure(figsize=(8, 8))
-        wedges, texts, autotexts = plt.pie(sizes, labels=labels, autopct=lambda pct: func(pct, sizes),
-                                           colors=colors, shadow=False, startangle=90)
-        plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        plt.title(f'Module Test Results - {date_str}')
-
-        # Improve label visibility
-        for text in autotexts:
-            text.set_color('white')
-            text.set_fontsize(12)
-
-        timestamp = datetime.now().strftime('%Y-%m-%d')  # Format for the filename
-        plt.savefig(os.path.join(self.log_dir, f'module_change_test_results_{timestamp}.png'))
-        plt.close()  # Close the figure to free up memory
+    @staticmethod
+    def _weekly_series(successful: RollingCounter, failed: RollingCounter) -> dict:
+        """Dates and per-day counts for the last 7 days, oldest first, ending today."""
+        now = time.time()
+        successful_days = successful.buckets(7, now)
+        return {
+            'dates': [datetime.fromtimestamp(start).strftime('%Y-%m-%d') for start, _ in successful_days],
+            'successful_tests': [count for _, count in successful_days],
+            'failed_tests': [count for _, count in failed.buckets(7, now)],
+        }
 
     def plot_weekly_module_change_test_results(self) -> None:
-        dates = [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
-        successful_tests = self.daily_successful_module_change_test
-        failed_tests = self.daily_failed_module_change_test
-
-        bar_width = 0.35  # Width of the bars
-        index = range(len(dates))  # Create an index for the x-axis
-
-        # Create a bar chart
-        plt.figure(figsize=(10, 6))
-        bars_successful = plt.bar(index, successful_tests, width=bar_width, label="Successful Tests", color="green",
-                                  align='center')
-        bars_failed = plt.bar([i + bar_width for i in index], failed_tests, width=bar_width, label="Failed Tests",
-                              color="red",
-                              align='center')
-        for bar in bars_successful:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-        for bar in bars_failed:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-        # Labeling the axes and title
-        plt.xlabel("Date")
-        plt.ylim(0,15)
-        plt.ylabel("Number of Tests")
-        plt.title("Upcoming Daily Test Results for the Next Week")
-        plt.xticks([i + bar_width / 2 for i in index], dates)  # Center the x-ticks between the bars
-        plt.legend()
-        plt.grid(axis='y')
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.log_dir, f'weekly_module_change_test_results.png'))
+        self.charts.submit('weekly', 'weekly_module_change_test_results.png',
+                           title="Daily Test Results for the Last Week", ylim=15,
+                           **self._weekly_series(self.daily_successful_module_change_test, self.daily_failed_module_change_test))
 
     def plot_weekly_ping_test_results(self) -> None:
-        dates = [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
-        successful_tests = self.daily_successful_ping_tests
-        failed_tests = self.daily_failed_ping_tests
-
-        bar_width = 0.35
-        index = range(len(dates))
-
-        plt.figure(figsize=(10, 6))
-        bars_successful = plt.bar(index, successful_tests, width=bar_width, label="Successful Tests", color="green",
-                                  align='center')
-        bars_failed = plt.bar([i + bar_width for i in index], failed_tests, width=bar_width, label="Failed Tests",
-                              color="red", align='center')
-
-        plt.ylim(0, 10)  # Adjust the y-limit to better fit your data
-
-        for bar in bars_successful:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-        for bar in bars_failed:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-
-        plt.xlabel("Date")
-        plt.ylabel("Number of Tests")
-        plt.title("Upcoming Daily Test Results for the Next Week")
-        plt.xticks([i + bar_width / 2 for i in index], dates)
-        plt.legend()
-        plt.grid(axis='y')
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.log_dir, f'weekly_ping_test_results.png'))
-        plt.close()
+        self.charts.submit('weekly', 'weekly_ping_test_results.png',
+                           title="Daily Test Results for the Last Week", ylim=10,
+                           **self._weekly_series(self.daily_successful_ping_tests, self.daily_failed_ping_tests))
 
     def plot_weekly_radio_change_results(self) -> None:
-        dates = [(datetime.now() + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
-        successful_tests = self.daily_successful_radio_change_test
-        failed_tests = self.daily_failed_radio_change_test
-
-        bar_width = 0.35  # Width of the bars
-        index = range(len(dates))  # Create an index for the x-axis
-
-        # Create a bar chart
-        plt.figure(figsize=(10, 6))
-        bars_successful = plt.bar(index, successful_tests, width=bar_width, label="Successful Tests", color="green",
-                                  align='center')
-        bars_failed = plt.bar([i + bar_width for i in index], failed_tests, width=bar_width, label="Failed Tests",
-                              color="red",
-                              align='center')
-        for bar in bars_successful:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-        for bar in bars_failed:
-            plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
-                     va='bottom')
-
-        # Labeling the axes and title
-        plt.xlabel("Date")
-        plt.ylim(0,15)
-        plt.ylabel("Number of Tests")
-        plt.title("Upcoming Daily Test Results for the Next Week")
-        plt.xticks([i + bar_width / 2 for i in index], dates)  # Center the x-ticks between the bars
-        plt.legend()
-        plt.grid(axis='y')
-
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.log_dir, f'weekly_radio_change_test_results.png'))
-
-    def send_ping_command(self) -> None:
+        self.charts.submit('weekly', 'weekly_radio_change_test_results.png',
+                           title="Daily Test Results for the Last Week", ylim=15,
+                           **self._weekly_series(self.daily_successful_radio_change_test, self.daily_failed_radio_change_test))
+
+    def _apply_and_reset(self, steps: list) -> TransactionResult:
+        """Sends the setting changes, saves them and resets the modem in one transaction."""
+        steps = steps + [Step("save", PROMPT, 5, required=False), Step("reset")]
+        result = self.console.transaction(steps)
+        self.console.invalidate_login()  # The reset ends the admin session
+        return result
+
+    def send_ping_command(self) -> Optional[TransactionResult]:
         """Sends the 'ip.ping 8.8.8.8' command to the modem and signals response monitoring."""
         if self.ser is not None:
             try:
-                time.sleep(1)
-                self.login_admin()
                 logging.info("Sending command: ip.ping 8.8.8.8")
-                self.ser.write("ip.ping 8.8.8.8\n".encode('utf-8'))
-                self.total_ping_tests += 1
+                self._open_pending_subscription('ping')
+                result = self.console.transaction([Step("ip.ping 8.8.8.8")])
+                if not result.ok:
+                    logging.error(f"Ping command failed: {result.error}")
+                self._count('total_ping_tests')
+                return result
             except serial.SerialException as e:
                     logging.error(f"Error sending command to {self.port}: {e}")
+        return None
 
-    def send_module_change_command(self) -> None:
+    def send_module_change_command(self) -> Optional[TransactionResult]:
         if self.ser is not None:
             try:
-                time.sleep(2)
-                self.login_admin()
                 logging.info("Checking module")
-                self.ser.write("print active_radio\n".encode())
-                response = self.wait_for_message_and_take_value("active_radio=")
-                logging.debug(f"Received response: {response}")
-                active_radio = self.extract_active_radio(response)
+                result = self.console.transaction([Step("print active_radio", r"active_radio=(\S+)\s", 30, regex=True)])
+                active_radio = result.value()
+                logging.debug(f"Active radio: {active_radio}")
+                self._open_pending_subscription('module')
+                steps = []
                 if active_radio =="2":
-                    self.ser.write("set active_radio 1\n".encode())
+                    steps.append(Step("set active_radio 1", PROMPT, 3, required=False))
                 elif active_radio == "1":
-                    self.ser.write("set active_radio 2\n".encode())
-                self.ser.write("save\n".encode())
-                self.ser.write("reset\n".encode())
-                self.total_module_tests += 1
+                    steps.append(Step("set active_radio 2", PROMPT, 3, required=False))
+                result = self._apply_and_reset(steps)
+                if not result.ok:
+                    logging.error(f"Module change command failed: {result.error}")
+                self._count('total_module_tests')
+                return result
             except serial.SerialException as e:
                 logging.error(f"Error sending command to {self.port}: {e}")
+        return None
 
-    def send_radio_change_command(self) -> None:
+    def send_radio_change_command(self) -> Optional[TransactionResult]:
         if self.ser is not None:
             try:
-                time.sleep(2)
-                self.login_admin()
                 logging.info("Checking radio")
-                time.sleep(0.5)
-                self.ser.write("print radio_mode\n".encode())
-
                 # Wait for a response that contains "radio_mode="
-                response = self.wait_for_message_and_take_value("radio_mode=")
-                logging.debug(f"Received response: {response}")
-
-                # Extract the specific radio mode value
-                radio_mode = self.extract_radio_mode(response)
+                result = self.console.transaction([Step("print radio_mode", r"radio_mode=(\S+)\s", 30, regex=True)])
+                radio_mode = result.value()
+                logging.debug(f"Radio mode: {radio_mode}")
+                self._open_pending_subscription('radio')
 
                 # Check radio mode and send corresponding command
+                steps = []
                 if radio_mode == "lte":
-                    self.ser.write("set radio_mode 2g\n".encode())
-                    logging.info("set radio_mode lte\n".encode())
-                elif radio_mode == "2g":
-                    self.ser.write("set radio_mode lte\n".encode())
-                    logging.info("set radio_mode 2g\n".encode())
-                elif radio_mode == "auto":
-                    self.ser.write("set radio_mode lte \n".encode())
-                    logging.info("set radio_mode lte\n".encode())
+                    steps.append(Step("set radio_mode 2g", PROMPT, 3, required=False))
+                elif radio_mode in ("2g", "auto"):
+                    steps.append(Step("set radio_mode lte", PROMPT, 3, required=False))
                 else:
                     logging.warning(f"Unexpected radio mode: {radio_mode}")
-                self.ser.write("save\n".encode())
-                self.ser.write("reset\n".encode())
+                for step in steps:
+                    logging.info(step.command)
+                result = self._apply_and_reset(steps)
+                if not result.ok:
+                    logging.error(f"Radio change command failed: {result.error}")
                 # Update counters and last change time
-                self.total_radio_tests += 1
+                self._count('total_radio_tests')
+                return result
             except serial.SerialException as e:
                 logging.error(f"Error sending command to {self.port}: {e}")
+        return None
 
 
     def start_monitors(self):
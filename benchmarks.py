@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from latency import LogLinearHistogram
+
+# Benchmark name -> {'value', 'unit', 'higher_is_better'}
+Results = Dict[str, dict]
+
+INGEST_LINE = "2026-10-18 12:00:00 LTE: RSRP=-95 RSRQ=-11 SINR=12 cell=0x01A2B3 band=20 zażółć\r\n"
+RESTART_BANNER = " Restart w ciagu 3 s"
+
+
+def _result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {'value': round(value, 6), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def _percentiles(prefix: str, histogram: LogLinearHistogram) -> Results:
+    return {f"{prefix}_p50_ms": _result(histogram.percentile(50) * 1000, 'ms', False),
+            f"{prefix}_p99_ms": _result(histogram.percentile(99) * 1000, 'ms', False)}
+
+
+def _pty():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def bench_serial_ingest(megabytes: float) -> Results:
+    """Bytes per second from the pty through SerialReader and _log_data into the log writer."""
+    from Serial import SerialCommunicator
+
+    master, slave, name = _pty()
+    text = INGEST_LINE * int(megabytes * 1024 * 1024 / len(INGEST_LINE.encode()))
+    payload = text.encode()
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, 'config_file.txt')
+        with open(config_file, 'w') as f:
+            f.write(f"[serial{platform.system()}]\nport = {name}\nbaudrate = 115200\ntimeout = 0.1\n"
+                    f"password = \nmetrics_port = 0\n")
+        communicator = SerialCommunicator(config_file, log_dir=directory)
+        started = time.perf_counter()
+        for offset in range(0, len(payload), 4096):
+            os.write(master, payload[offset:offset + 4096])
+        deadline = time.monotonic() + 120
+        while communicator.received_chars.value < len(text) and time.monotonic() < deadline:
+            time.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        received = communicator.received_chars.value / len(text) * len(payload)
+        communicator.close()
+    os.close(master)
+    os.close(slave)
+    return {'serial_ingest_mb_per_s': _result(received / elapsed / 1024 / 1024, 'MB/s', True)}
+
+
+def bench_pattern_detection(samples: int) -> Results:
+    """Time from the restart banner reaching the pty to the monitor loop's matcher firing."""
+    from serial_reader import SerialReader
+    from stream_matcher import StreamMatcher
+
+    master, slave, name = _pty()
+    reader = SerialReader(name, 115200, 0.1)
+    reader.connect()
+    reader.start()
+    histogram = LogLinearHistogram()
+    filler = ("RSRP=-95 RSRQ=-11 " * 20 + "\r\n").encode()
+    for _ in range(samples):
+        matcher = StreamMatcher().register('restart', RESTART_BANNER)
+        with reader.subscribe() as subscription:
+            os.write(master, filler)
+            started = time.perf_counter()
+            os.write(master, f"{RESTART_BANNER}\r\n".encode())
+            if subscription.wait_for_match(matcher, 5) is not None:
+                histogram.record(time.perf_counter() - started)
+    reader.stop()
+    os.close(master)
+    os.close(slave)
+    return _percentiles('pattern_detection', histogram)
+
+
+def bench_charts(repeats: int) -> Results:
+    """Cost of drawing each chart the plot_* methods submit, with the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    from chart_renderer import render_pie, render_weekly
+
+    dates = [f"2026-10-{day:02d}" for day in range(12, 19)]
+    charts = {
+        'pie': lambda path: render_pie(plt, path, "Ping Test Results", 280, 8),
+        'weekly': lambda path: render_weekly(plt, path, "Daily Test Results for the Last Week", dates,
+                                             [5, 6, 7, 6, 5, 7, 6], [1, 0, 0, 2, 1, 0, 1], 10),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for kind, draw in charts.items():
+            path = os.path.join(directory, f"{kind}.png")
+            draw(path)  # Warm-up: font cache and backend setup
+            started = time.perf_counter()
+            for _ in range(repeats):
+                draw(path)
+            results[f"chart_{kind}_ms"] = _result((time.perf_counter() - started) / repeats * 1000, 'ms', False)
+    return results
+
+
+def bench_meter_polling(meters: int, cycles: int, concurrency_levels: List[int]) -> Results:
+    """Read cycles per second against emulated meters: the synchronous loop and the async poller."""
+    import odczyt_licznika
+    from meter_emulator import MeterEmulator, MeterOptions
+    from meter_poller import Meter, MeterPoller
+
+    emulator = MeterEmulator(meters, base_port=random.randint(30000, 40000), options=MeterOptions(0.002, 0.001))
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(emulator.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    results = {}
+    try:
+        hex_data_list = odczyt_licznika.data_to_send_hex_list
+        odczyt_licznika.plik = open(os.devnull, 'w')
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(cycles):
+                odczyt_licznika.send_and_receive_hex_data_tcp(hex_data_list, emulator.host,
+                                                              emulator.base_port + i % meters)
+        results['poll_sync_cycles_per_s'] = _result(cycles / (time.perf_counter() - started), 'cycles/s', True)
+        odczyt_licznika.plik.close()
+
+        fleet = [Meter(emulator.host, emulator.base_port + i) for i in range(meters)]
+        for concurrency in concurrency_levels:
+            poller = MeterPoller(fleet, hex_data_list, concurrency=concurrency, timeout=5)
+            rounds = max(1, cycles // meters)
+            started = time.perf_counter()
+            for _ in range(rounds):
+                asyncio.run(poller.poll_once())
+            rate = rounds * meters / (time.perf_counter() - started)
+            results[f"poll_async_c{concurrency}_cycles_per_s"] = _result(rate, 'cycles/s', True)
+    finally:
+        asyncio.run_coroutine_threadsafe(emulator.stop(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(selected: List[str], quick: bool) -> dict:
+    scale = 0.2 if quick else 1
+    benchmarks: Dict[str, Callable[[], Results]] = {
+        'ingest': lambda: bench_serial_ingest(16 * scale),
+        'patterns': lambda: bench_pattern_detection(int(500 * scale)),
+        'charts': lambda: bench_charts(max(1, int(10 * scale))),
+        'poll': lambda: bench_meter_polling(200, int(2000 * scale), [1, 10, 100]),
+    }
+    random.seed(1)
+    results = {}
+    for name in selected:
+        print(f"Running {name}...", file=sys.stderr)
+        results.update(benchmarks[name]())
+    return {
+        'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'), 'revision': _git_revision(),
+                 'python': platform.python_version(), 'platform': platform.platform(), 'quick': quick},
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Lines describing every benchmark; regressions beyond `threshold` percent start with 'REGRESSION'."""
+    lines = []
+    for name, new in sorted(current['results'].items()):
+        old = baseline['results'].get(name)
+        if old is None or not old['value']:
+            lines.append(f"new         {name}: {new['value']:.3f} {new['unit']}")
+            continue
+        change = (new['value'] - old['value']) / old['value'] * 100
+        worse = -change if new['higher_is_better'] else change
+        status = "REGRESSION" if worse > threshold else "improved" if worse < -threshold else "ok"
+        lines.append(f"{status:<11} {name}: {old['value']:.3f} -> {new['value']:.3f} {new['unit']} ({change:+.1f}%)")
+    for name in sorted(set(baseline['results']) - set(current['results'])):
+        lines.append(f"missing     {name}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the serial and meter-polling hot paths.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('--output', default='benchmark.json')
+    run_parser.add_argument('--only', default='ingest,patterns,charts,poll',
+                            help="comma-separated subset of: ingest, patterns, charts, poll")
+    run_parser.add_argument('--quick', action='store_true', help="smaller workloads for a fast check")
+    compare_parser = commands.add_parser('compare')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=10, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        report = run([name.strip() for name in args.only.split(',') if name.strip()], args.quick)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        for name, result in report['results'].items():
+            print(f"{name}: {result['value']:.3f} {result['unit']}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        lines = compare(baseline, current, args.threshold)
+        print("\n".join(lines))
+        if any(line.startswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import os
+from typing import Dict, List, Optional
+
+
+def _func(pct, allvals):
+    # Custom function to format labels
+    absolute = int(round(pct / 100. * sum(allvals)))
+    return f'{absolute} ({pct:.1f}%)'
+
+
+def render_pie(plt, path: str, title: str, total_positive: int, total_negative: int) -> None:
+    """Plots the test results as a pie chart."""
+    labels = []
+    sizes = []
+    colors = []
+
+    if total_positive > 0:
+        labels.append('Successful Tests')
+        sizes.append(total_positive)
+        colors.append('green')
+    if total_negative > 0:
+        labels.append('Failed Tests')
+        sizes.append(total_negative)
+        colors.append('red')
+
+    if not sizes:
+        sizes = [1]
+        labels = ['No Tests']
+        colors = ['grey']
+
+    # Plotting
+    plt.figure(figsize=(8, 8))
+    wedges, texts, autotexts = plt.pie(sizes, labels=labels, autopct=lambda pct: _func(pct, sizes),
+                                       colors=colors, shadow=False, startangle=90)
+    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+    plt.title(title)
+
+    # Improve label visibility
+    for text in autotexts:
+        text.set_color('white')
+        text.set_fontsize(12)
+
+    plt.savefig(path)
+    plt.close()  # Close the figure to free up memory
+
+
+def render_weekly(plt, path: str, title: str, dates: List[str], successful_tests: List[int],
+                  failed_tests: List[int], ylim: int) -> None:
+    """Plots successful and failed tests per day as a grouped bar chart."""
+    bar_width = 0.35  # Width of the bars
+    index = range(len(dates))  # Create an index for the x-axis
+
+    # Create a bar chart
+    plt.figure(figsize=(10, 6))
+    bars_successful = plt.bar(index, successful_tests, width=bar_width, label="Successful Tests", color="green",
+                              align='center')
+    bars_failed = plt.bar([i + bar_width for i in index], failed_tests, width=bar_width, label="Failed Tests",
+                          color="red", align='center')
+    for bar in bars_successful:
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
+                 va='bottom')
+    for bar in bars_failed:
+        plt.text(bar.get_x() + bar.get_width() / 2, bar.get_height() - 0.3, str(bar.get_height()), ha='center',
+                 va='bottom')
+
+    # Labeling the axes and title
+    plt.xlabel("Date")
+    plt.ylim(0, ylim)
+    plt.ylabel("Number of Tests")
+    plt.title(title)
+    plt.xticks([i + bar_width / 2 for i in index], dates)  # Center the x-ticks between the bars
+    plt.legend()
+    plt.grid(axis='y')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()  # Close the figure to free up memory
+
+
+RENDERERS = {'pie': render_pie, 'weekly': render_weekly}
+
+
+def _render_worker(jobs) -> None:
+    """Renders chart snapshots from the queue; pyplot is imported here only, with the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        kind, path, params = job
+        try:
+            RENDERERS[kind](plt, path, **params)
+        except Exception as e:
+            logging.error(f"Failed to render {path}: {e}")
+
+
+class ChartRenderer:
+    """Renders charts in a separate process and skips charts whose data did not change.
+
+    Callers submit a snapshot of the numbers behind a chart; a snapshot equal to the last one
+    submitted for the same chart is dropped without being sent to the worker.
+    """
+
+    def __init__(self, log_dir: str) -> None:
+        self.log_dir = log_dir
+        self._jobs = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._last_snapshots: Dict[str, tuple] = {}
+
+    def _ensure_worker(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            return
+        if self._process is not None:
+            logging.warning("Chart renderer process exited, restarting it.")
+            # Charts queued for the dead worker may never have been drawn
+            self._last_snapshots.clear()
+        # Spawned, not forked: a fork would copy locks held by the parent's reader, writer and server threads
+        context = multiprocessing.get_context('spawn')
+        self._jobs = context.Queue()
+        self._process = context.Process(target=_render_worker, args=(self._jobs,), name="ChartRenderer", daemon=True)
+        self._process.start()
+
+    def submit(self, kind: str, filename: str, **params) -> bool:
+        """Queues a chart for rendering; returns False if its data is unchanged since the last render."""
+        path = os.path.join(self.log_dir, filename)
+        snapshot = (kind, tuple(sorted((key, repr(value)) for key, value in params.items())))
+        if self._last_snapshots.get(path) == snapshot:
+            return False
+        self._ensure_worker()
+        self._jobs.put((kind, path, params))
+        self._last_snapshots[path] = snapshot
+        return True
+
+    def close(self) -> None:
+        """Lets the worker finish the queued charts and stops it."""
+        if self._process is not None and self._process.is_alive():
+            self._jobs.put(None)
+            self._process.join(timeout=30)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._process = None
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+CHECKPOINT_VERSION = 1
+
+# When a checkpoint is forced to disk: every save, at most once per `fsync_interval`, or never
+# (the rename still keeps the file whole if the program crashes, but not if the power fails)
+FSYNC_ALWAYS = 'always'
+FSYNC_INTERVAL = 'interval'
+FSYNC_NEVER = 'never'
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+
+def _fsync_directory(path: str) -> None:
+    """Makes a rename in the directory durable; not possible (nor needed) on Windows."""
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, data: bytes, fsync: bool = True) -> None:
+    """Replaces `path` with `data` so that readers see either the old or the new file, never a mix."""
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temporary, path)
+    if fsync:
+        _fsync_directory(path)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    """The state saved in a checkpoint with its save time as 'saved_at', or None if there is none usable."""
+    try:
+        with open(path, 'rb') as f:
+            checkpoint = json.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.error(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if not isinstance(checkpoint, dict) or checkpoint.get('version') != CHECKPOINT_VERSION:
+        logging.error(f"Ignoring checkpoint {path} with an unknown format")
+        return None
+    return dict(checkpoint['state'], saved_at=checkpoint['saved_at'])
+
+
+class Checkpointer:
+    """Saves state dictionaries to one JSON file with write-then-rename, syncing per the fsync policy."""
+
+    def __init__(self, path: str, fsync: str = FSYNC_ALWAYS, fsync_interval: float = 300) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.saves = 0
+        self._last_fsync = 0.0
+
+    def _should_fsync(self) -> bool:
+        if self.fsync == FSYNC_INTERVAL:
+            return time.monotonic() - self._last_fsync >= self.fsync_interval
+        return self.fsync == FSYNC_ALWAYS
+
+    def save(self, state: dict) -> bool:
+        """Writes the checkpoint; errors are logged, since losing one checkpoint must not stop a campaign."""
+        data = json.dumps({'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'state': state},
+                          separators=(',', ':')).encode()
+        fsync = self._should_fsync()
+        try:
+            write_atomic(self.path, data, fsync)
+        except OSError as e:
+            logging.error(f"Failed to write checkpoint {self.path}: {e}")
+            return False
+        if fsync:
+            self._last_fsync = time.monotonic()
+        self.saves += 1
+        return True
+
+    def load(self) -> Optional[dict]:
+        return load_checkpoint(self.path)
+
+    def remove(self) -> None:
+        """Deletes the checkpoint, e.g. when a campaign has finished and should not be resumed."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
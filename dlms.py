@@ -0,0 +1,235 @@
+import asyncio
+import binascii
+import logging
+import socket
+import struct
+import time
+from typing import List, NamedTuple, Optional
+
+# GET-Request-Normal for the clock (class 8, 0.0.1.0.0.255, attribute 2), used as a keep-alive
+KEEPALIVE_HEX = "000100010001000DC001C100080000010000FF0200"
+
+
+# Wrapper header: version, source wPort, destination wPort, APDU length (all big-endian uint16)
+WRAPPER_HEADER = struct.Struct('>HHHH')
+WRAPPER_VERSION = 1
+MAX_APDU_LENGTH = 0xFFFF
+
+
+# Request APDU tag -> name of the request/response exchange it starts
+APDU_EXCHANGES = {0x60: 'AARQ/AARE', 0x62: 'RLRQ/RLRE', 0xC0: 'GET', 0xC1: 'SET', 0xC3: 'ACTION'}
+
+
+def apdu_name(frame: bytes) -> str:
+    """Names the exchange started by a wrapper frame, e.g. 'AARQ/AARE' for a Connect request."""
+    if len(frame) <= WRAPPER_HEADER.size:
+        return 'unknown'
+    tag = frame[WRAPPER_HEADER.size]
+    return APDU_EXCHANGES.get(tag, f"0x{tag:02X}")
+
+
+class SessionError(Exception):
+    """Raised when an established DLMS association is lost."""
+
+
+class FrameError(SessionError):
+    """Raised when the meter sends something that is not a DLMS/COSEM wrapper frame."""
+
+
+class WrapperFrame(NamedTuple):
+    version: int
+    source: int
+    destination: int
+    apdu: bytes
+
+    @property
+    def raw(self) -> bytes:
+        return WRAPPER_HEADER.pack(self.version, self.source, self.destination, len(self.apdu)) + self.apdu
+
+
+def _parse_header(header) -> tuple:
+    version, source, destination, length = WRAPPER_HEADER.unpack(header)
+    if version != WRAPPER_VERSION:
+        raise FrameError(f"Unexpected wrapper version {version}.")
+    return version, source, destination, length
+
+
+class FrameReader:
+    """Reads exactly one wrapper frame at a time from a stream socket.
+
+    Data is received with recv_into into one preallocated buffer large enough for the biggest
+    possible frame. Bytes that arrive beyond the current frame (back-to-back responses) stay
+    buffered for the next call, and fragmented frames are reassembled. If a read times out in the
+    middle of a frame, the rest of it may still arrive and would be taken for the next header, so
+    the reader is marked `desynchronised` and refuses to read again; the connection must be reopened.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self._buffer = bytearray(WRAPPER_HEADER.size + MAX_APDU_LENGTH)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self.desynchronised = False
+
+    def _fill(self, size: int) -> bool:
+        """Receives until `size` unread bytes are buffered; False if the peer closed the connection."""
+        while self._end - self._start < size:
+            if self._start + size > len(self._buffer):
+                # Move the unread bytes to the front so the rest of the frame fits
+                pending = self._end - self._start
+                self._view[:pending] = self._view[self._start:self._end]
+                self._start, self._end = 0, pending
+            received = self.sock.recv_into(self._view[self._end:])
+            if not received:
+                return False
+            self._end += received
+        return True
+
+    def read_frame(self) -> Optional[WrapperFrame]:
+        """Returns the next frame, or None if the connection was closed before one was complete."""
+        if self.desynchronised:
+            raise FrameError("Stream out of sync after a partial frame timed out.")
+        try:
+            if not self._fill(WRAPPER_HEADER.size):
+                return None
+            version, source, destination, length = _parse_header(self._view[self._start:self._start + 8])
+            if not self._fill(WRAPPER_HEADER.size + length):
+                return None
+        except socket.timeout:
+            if self._end > self._start:
+                self.desynchronised = True
+            self.reset()
+            raise
+        apdu_start = self._start + WRAPPER_HEADER.size
+        apdu = bytes(self._view[apdu_start:apdu_start + length])
+        self._start = apdu_start + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return WrapperFrame(version, source, destination, apdu)
+
+    def reset(self) -> None:
+        self._start = self._end = 0
+
+
+async def read_frame_async(reader: asyncio.StreamReader) -> Optional[WrapperFrame]:
+    """Asyncio counterpart of FrameReader.read_frame."""
+    try:
+        version, source, destination, length = _parse_header(await reader.readexactly(WRAPPER_HEADER.size))
+        apdu = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return WrapperFrame(version, source, destination, apdu)
+
+
+class MeterSession:
+    """Keeps one TCP connection and DLMS association to a meter open across read cycles.
+
+    The association (AARQ) is opened lazily on the first cycle and reopened transparently after a
+    failure; every cycle then only sends `request_hex_list` on the existing session. The number of
+    cycles each association survived is kept in `session_lifetimes`.
+    """
+
+    def __init__(self, ip_address: str, port: int, timeout: float, connect_hex: str,
+                 disconnect_hex: str, request_hex_list: Optional[List[str]] = None) -> None:
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self.connect_frame = binascii.unhexlify(connect_hex)
+        self.disconnect_frame = binascii.unhexlify(disconnect_hex)
+        self.request_frames = [binascii.unhexlify(h) for h in (request_hex_list or [KEEPALIVE_HEX])]
+
+        self.sock = None
+        self.frame_reader = None
+        self.current_session_cycles = 0
+        self.session_lifetimes: List[int] = []
+        self.reconnects = 0
+        # Response time of each request in the last cycle, None where it went unanswered
+        self.rtts: List[Optional[float]] = []
+
+    @property
+    def connected(self) -> bool:
+        return self.sock is not None
+
+    def _exchange(self, frame: bytes) -> bytes:
+        self.sock.sendall(frame)
+        response = self.frame_reader.read_frame()
+        return response.raw if response else b""
+
+    def open(self) -> bytes:
+        """Connects and sends the AARQ; returns the AARE or raises socket.error/SessionError."""
+        self.sock = socket.create_connection((self.ip_address, self.port), timeout=self.timeout)
+        self.frame_reader = FrameReader(self.sock)
+        try:
+            response = self._exchange(self.connect_frame)
+        except (socket.error, FrameError):
+            self._drop(record=False)
+            raise
+        if not response:
+            self._drop(record=False)
+            raise SessionError("Meter closed the connection instead of answering the AARQ.")
+        self.current_session_cycles = 0
+        return response
+
+    def _drop(self, record: bool = True) -> None:
+        """Forgets the connection without sending the RLRQ."""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+            self.sock = None
+            if record:
+                self.session_lifetimes.append(self.current_session_cycles)
+
+    def cycle(self) -> List[Optional[bytes]]:
+        """Sends the per-cycle requests on the open association, reconnecting once if it was lost.
+
+        Returns one entry per request frame (None where the meter did not answer in time). After a
+        timeout a late response could still arrive and be taken for the next one, so the remaining
+        requests of the cycle are not sent and the association is dropped, to be reopened by the
+        next cycle. Raises socket.timeout/socket.error if the association cannot be (re)established.
+        """
+        for attempt in range(2):
+            if not self.connected:
+                if self.session_lifetimes:
+                    self.reconnects += 1
+                self.open()
+            try:
+                responses = []
+                self.rtts = []
+                for frame in self.request_frames:
+                    request_start = time.perf_counter()
+                    try:
+                        response = self._exchange(frame)
+                    except socket.timeout:
+                        responses += [None] * (len(self.request_frames) - len(responses))
+                        self.rtts += [None] * (len(self.request_frames) - len(self.rtts))
+                        self.current_session_cycles += 1
+                        self._drop()
+                        return responses
+                    if response == b"":
+                        raise SessionError("Meter closed the association.")
+                    responses.append(response)
+                    self.rtts.append(time.perf_counter() - request_start)
+                self.current_session_cycles += 1
+                return responses
+            except (SessionError, socket.error) as e:
+                logging.info(f"Session to {self.ip_address}:{self.port} lost after "
+                             f"{self.current_session_cycles} cycles: {e}")
+                self._drop()
+                if attempt:
+                    raise
+        return []
+
+    def close(self) -> Optional[bytes]:
+        """Releases the association (RLRQ) and closes the connection."""
+        if not self.connected:
+            return None
+        response = None
+        try:
+            response = self._exchange(self.disconnect_frame)
+        except socket.error:
+            pass
+        self._drop()
+        return response
@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+from datetime import datetime
+from typing import List, Sequence
+
+import odczyt_licznika
+from meter_health import HealthTracker
+from meter_poller import OUTCOMES, Meter, MeterPoller
+from odczyt_licznika import OUTCOME_ERROR, OUTCOME_NO_RESPONSE, OUTCOME_PARTIAL, OUTCOME_SUCCESSFUL, OUTCOME_TIMEOUT
+
+# Per-worker row in the shared aggregate: one slot per outcome, then the completed cycle count and
+# the meter polls skipped by open circuit breakers
+ROW_SIZE = len(OUTCOMES) + 2
+CYCLES_SLOT = len(OUTCOMES)
+SKIPPED_SLOT = len(OUTCOMES) + 1
+
+
+def load_meters(path: str) -> List[Meter]:
+    """Loads one meter per line as ip:port[:timeout] (commas also accepted); '#' starts a comment."""
+    meters = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                meters.append(Meter.parse(line.replace(',', ':')))
+    return meters
+
+
+def shard(meters: Sequence[Meter], workers: int) -> List[List[Meter]]:
+    """Splits meters round-robin so every worker gets a similar mix."""
+    return [list(meters[i::workers]) for i in range(workers) if meters[i::workers]]
+
+
+def _worker(index: int, meters: List[Meter], aggregate, num_retries: int, delay_between_runs: float,
+            concurrency: int, timeout: float) -> None:
+    """Polls one shard and publishes its running totals into its own row of the shared aggregate."""
+    health = HealthTracker(timeout, odczyt_licznika.min_timeout, odczyt_licznika.adaptive_timeout,
+                           odczyt_licznika.breaker_failures, odczyt_licznika.breaker_backoff,
+                           odczyt_licznika.breaker_backoff_max)
+    poller = MeterPoller(meters, concurrency=concurrency, timeout=timeout, health=health)
+    row = index * ROW_SIZE
+
+    async def run() -> None:
+        for _ in range(num_retries):
+            await poller.poll_once()
+            # Only this worker writes its row, so plain stores without a lock are enough
+            for slot, outcome in enumerate(OUTCOMES):
+                aggregate[row + slot] = poller.totals[outcome]
+            aggregate[row + CYCLES_SLOT] = poller.cycles
+            aggregate[row + SKIPPED_SLOT] = poller.skipped
+            await asyncio.sleep(delay_between_runs)
+
+    asyncio.run(run())
+
+
+class Fleet:
+    """Runs the fleet in `workers` processes and reports fleet-wide statistics from shared memory."""
+
+    def __init__(self, meters: Sequence[Meter], workers: int = None, concurrency: int = 100,
+                 timeout: float = 5) -> None:
+        self.shards = shard(meters, workers or os.cpu_count() or 1)
+        self.meter_count = len(meters)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.aggregate = multiprocessing.Array('q', len(self.shards) * ROW_SIZE, lock=False)
+        self.processes: List[multiprocessing.Process] = []
+
+    def start(self, num_retries: int, delay_between_runs: float) -> None:
+        for index, meters in enumerate(self.shards):
+            process = multiprocessing.Process(
+                target=_worker, name=f"fleet-worker-{index}", daemon=True,
+                args=(index, meters, self.aggregate, num_retries, delay_between_runs, self.concurrency, self.timeout))
+            process.start()
+            self.processes.append(process)
+
+    def totals(self) -> dict:
+        totals = {outcome: 0 for outcome in OUTCOMES}
+        for index in range(len(self.shards)):
+            row = index * ROW_SIZE
+            for slot, outcome in enumerate(OUTCOMES):
+                totals[outcome] += self.aggregate[row + slot]
+        return totals
+
+    def alive(self) -> bool:
+        return any(process.is_alive() for process in self.processes)
+
+    def wait(self, timeout: float) -> None:
+        """Sleeps until the timeout expires or a worker exits."""
+        sentinels = [process.sentinel for process in self.processes if process.is_alive()]
+        if sentinels:
+            multiprocessing.connection.wait(sentinels, timeout)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+    def report(self, log_dir: str) -> None:
+        """Prints fleet-wide statistics and appends them to the daily log."""
+        totals = self.totals()
+        skipped = sum(self.aggregate[index * ROW_SIZE + SKIPPED_SLOT] for index in range(len(self.shards)))
+        reads = sum(totals.values())
+        percent = (totals[OUTCOME_SUCCESSFUL] / reads) * 100 if reads else 0.0
+        lines = [
+            f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Fleet: {self.meter_count} meters in {len(self.shards)} workers, {reads} reads",
+            f"Meter reading accuracy: {percent:.2f}%",
+            f"Successful meter readings: {totals[OUTCOME_SUCCESSFUL]}",
+            f"Incomplete meter readings: {totals[OUTCOME_PARTIAL]}",
+            f"Meter not responding: {totals[OUTCOME_NO_RESPONSE]}",
+            f"TCP connection error: {totals[OUTCOME_ERROR]}",
+            f"TCP timeout error: {totals[OUTCOME_TIMEOUT]}",
+            f"Meters skipped (circuit breaker open): {skipped}",
+            "---------------------------------------------",
+        ]
+        print("\n".join(lines))
+        file_name = str(log_dir) + datetime.now().strftime('%Y-%m-%d_odczyt_licznika' + '.txt')
+        with open(file_name, 'a') as plik:
+            plik.write("\n".join(lines) + "\n")
+
+
+def main() -> None:
+    config = odczyt_licznika.config['CONFIG']
+    parser = argparse.ArgumentParser(description="Poll a fleet of meters with one worker process per core.")
+    parser.add_argument('--meters-file', default=config.get('meters_file', fallback='meters.txt'))
+    parser.add_argument('--workers', type=int, default=config.getint('workers', fallback=os.cpu_count() or 1))
+    parser.add_argument('--concurrency', type=int, default=config.getint('concurrency', fallback=100))
+    parser.add_argument('--timeout', type=float, default=odczyt_licznika.socket_timeout)
+    parser.add_argument('--retries', type=int, default=odczyt_licznika.num_retries)
+    parser.add_argument('--delay', type=float, default=odczyt_licznika.delay_between_runs)
+    parser.add_argument('--report-interval', type=float, default=60)
+    args = parser.parse_args()
+
+    meters = load_meters(args.meters_file)
+    fleet = Fleet(meters, args.workers, args.concurrency, args.timeout)
+    logging.info(f"Polling {len(meters)} meters from {args.meters_file} in {len(fleet.shards)} workers")
+    fleet.start(args.retries, args.delay)
+    try:
+        while fleet.alive():
+            fleet.wait(args.report_interval)
+            fleet.report(odczyt_licznika.log_dir)
+    except KeyboardInterrupt:
+        logging.info("Fleet polling interrupted by user.")
+    finally:
+        fleet.stop()
+        fleet.report(odczyt_licznika.log_dir)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,120 @@
+from typing import Dict, List, Tuple
+
+
+class LogLinearHistogram:
+    """Fixed-memory latency histogram.
+
+    Values are recorded in microseconds into power-of-two ranges, each split into `sub_buckets`
+    linear buckets, so the relative error stays below 1/sub_buckets over the whole range while the
+    memory use is fixed at construction. Values above `max_seconds` land in the last bucket.
+    """
+
+    def __init__(self, sub_buckets: int = 16, max_seconds: float = 3600) -> None:
+        if sub_buckets & (sub_buckets - 1):
+            raise ValueError("sub_buckets must be a power of two")
+        self.sub_buckets = sub_buckets
+        self._sub_bits = sub_buckets.bit_length() - 1
+        self._max_value = int(max_seconds * 1_000_000)
+        self.counts = [0] * (self._index(self._max_value) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self._sub_bits - 1
+        return (shift + 1) * self.sub_buckets + (value >> shift) - self.sub_buckets
+
+    def _upper_bound(self, index: int) -> int:
+        if index < self.sub_buckets:
+            return index
+        shift = index // self.sub_buckets - 1
+        sub_bucket = index % self.sub_buckets + self.sub_buckets
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds: float) -> None:
+        value = min(max(int(seconds * 1_000_000), 0), self._max_value)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """Returns the value in seconds below which `percent` of the recorded values fall."""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(percent / 100 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def mean(self) -> float:
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def merge(self, other: 'LogLinearHistogram') -> None:
+        """Adds the values recorded by a histogram with the same layout."""
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class LatencyTracker:
+    """Keeps one histogram per (meter, phase), e.g. 'connect', 'AARQ/AARE', 'RLRQ/RLRE', 'cycle'.
+
+    `histograms` cover the current report window, so a recent slowdown shows in its percentiles
+    however long the campaign has run; new_window() folds them into the campaign `totals`.
+    """
+
+    def __init__(self, sub_buckets: int = 16) -> None:
+        self.sub_buckets = sub_buckets
+        self.histograms: Dict[Tuple[str, str], LogLinearHistogram] = {}
+        self.totals: Dict[Tuple[str, str], LogLinearHistogram] = {}
+
+    def record(self, meter: str, phase: str, seconds: float) -> None:
+        key = (meter, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LogLinearHistogram(self.sub_buckets)
+        histogram.record(seconds)
+
+    def new_window(self) -> None:
+        """Adds the current window to the campaign totals and starts an empty one."""
+        for key, histogram in self.histograms.items():
+            total = self.totals.get(key)
+            if total is None:
+                total = self.totals[key] = LogLinearHistogram(self.sub_buckets)
+            total.merge(histogram)
+            histogram.reset()
+
+    def report(self, campaign: bool = False) -> List[str]:
+        """One line per meter and phase with count, p50/p90/p99 and max in milliseconds.
+
+        Covers the current window, or with campaign=True everything recorded so far (which closes the window).
+        """
+        if campaign:
+            self.new_window()
+        histograms = self.totals if campaign else self.histograms
+        lines = []
+        for (meter, phase), histogram in sorted(histograms.items()):
+            if not histogram.count:
+                continue
+            lines.append(f"Latency {meter} {phase}: n={histogram.count} "
+                         f"p50={histogram.percentile(50) * 1000:.1f}ms "
+                         f"p90={histogram.percentile(90) * 1000:.1f}ms "
+                         f"p99={histogram.percentile(99) * 1000:.1f}ms "
+                         f"max={histogram.max / 1000:.1f}ms")
+        return lines
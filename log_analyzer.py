@@ -0,0 +1,228 @@
+import argparse
+import gzip
+import json
+import mmap
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from log_rotation import COMPRESSED_EXT, log_segments
+
+# Marker lines SerialCommunicator writes to the serial log next to the modem output
+TEST_RESULT_MARKER = "Test result:"
+TEST_RESET_MARKER = "Test reset:"
+
+# Everything the statistics are built from; the timestamp is read from the start of the matching line.
+# One pattern per event: each starts with a literal, which the regex engine scans for far faster
+# than an alternation, so several passes over the mapped file beat one combined pattern.
+EVENT_PATTERNS = {
+    'restart': re.compile(rb"Restart w ciagu 3 s"),
+    'restarted': re.compile(rb"Modul radiowy poprawnie wykryty i zainicjowany"),
+    'result': re.compile(re.escape(TEST_RESULT_MARKER.encode()) + rb" (\w+) (successful|failed)"),
+    'reset': re.compile(re.escape(TEST_RESET_MARKER.encode()) + rb" (\w+)"),
+}
+TIMESTAMP = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\.\d{3} - ")
+LOG_NAME = re.compile(r"serial_log_(?P<port>.+?)(?:_\d{4}-\d\d-\d\d)?(?:\.\d+)?\.txt(?:\.gz)?$")
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# (timestamp, kind, test, result)
+Event = Tuple[float, str, Optional[str], Optional[str]]
+
+
+class ChunkResult(NamedTuple):
+    first: Optional[float]
+    last: Optional[float]
+    events: List[Event]
+    size: int
+
+
+Buffer = Union[mmap.mmap, bytes]
+
+
+def _line_start(mm: Buffer, position: int) -> int:
+    """First line start at or after `position`, so adjacent chunks share no line."""
+    if position <= 0:
+        return 0
+    newline = mm.find(b'\n', position - 1)
+    return len(mm) if newline < 0 else newline + 1
+
+
+def _timestamp(mm: Buffer, line_start: int) -> Optional[float]:
+    match = TIMESTAMP.match(mm, line_start)
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1).decode(), "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+def _scan(mm: Buffer, start: int, end: int) -> ChunkResult:
+    start, end = _line_start(mm, start), _line_start(mm, end)
+    events = []
+    for kind, pattern in EVENT_PATTERNS.items():
+        for match in pattern.finditer(mm, start, end):
+            timestamp = _timestamp(mm, mm.rfind(b'\n', start, match.start()) + 1 or start)
+            if timestamp is not None:
+                groups = [group.decode() for group in match.groups()]
+                events.append((timestamp, kind, *(groups + [None, None])[:2]))
+    first = _timestamp(mm, start) if start < end else None
+    last = _timestamp(mm, mm.rfind(b'\n', start, end - 1) + 1 or start) if start < end else None
+    return ChunkResult(first, last, events, end - start)
+
+
+def scan_chunk(path: str, start: int, end: int) -> ChunkResult:
+    """Finds every event in the lines starting within [start, end) of a log file.
+
+    Compressed segments are always scanned whole, decompressed in memory.
+    """
+    if path.endswith(COMPRESSED_EXT):
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        return _scan(data, 0, len(data))
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ChunkResult(None, None, [], 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan(mm, start, end)
+
+
+def _scan_task(task: Tuple[str, int, int]) -> ChunkResult:
+    return scan_chunk(*task)
+
+
+class PortStatistics:
+    """The counters SerialCommunicator keeps in memory, rebuilt from one port's log events."""
+
+    def __init__(self, port: str) -> None:
+        self.port = port
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.restarts = 0
+        self.test_resets = 0
+        self.downtime = 0.0
+        self.results: Dict[str, Dict[str, int]] = defaultdict(lambda: {'successful': 0, 'failed': 0})
+        self.daily: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(
+            lambda: defaultdict(lambda: {'successful': 0, 'failed': 0}))
+        self.bytes_scanned = 0
+
+    @property
+    def restart_counter(self) -> int:
+        """Restarts not caused by a test, same as SerialCommunicator.restart_counter."""
+        return self.restarts - self.test_resets
+
+    @property
+    def uptime_percentage(self) -> float:
+        span = (self.last - self.first) if self.first is not None and self.last is not None else 0
+        return (span - self.downtime) / span * 100 if span > 0 else 0.0
+
+    def fold(self, chunks: Sequence[ChunkResult]) -> None:
+        events = sorted((event for chunk in chunks for event in chunk.events), key=lambda event: event[0])
+        stamps = [stamp for chunk in chunks for stamp in (chunk.first, chunk.last) if stamp is not None]
+        self.first = min(stamps, default=None)
+        self.last = max(stamps, default=None)
+        self.bytes_scanned = sum(chunk.size for chunk in chunks)
+        down_since = None
+        for timestamp, kind, test, result in events:
+            if kind == 'restart':
+                self.restarts += 1
+                if down_since is None:
+                    down_since = timestamp
+            elif kind == 'restarted':
+                if down_since is not None:
+                    self.downtime += timestamp - down_since
+                    down_since = None
+            elif kind == 'reset':
+                self.test_resets += 1
+            else:
+                self.results[test][result] += 1
+                day = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+                self.daily[day][test][result] += 1
+        if down_since is not None and self.last is not None:
+            self.downtime += self.last - down_since
+
+    def as_dict(self) -> dict:
+        return {
+            'port': self.port,
+            'from': datetime.fromtimestamp(self.first).isoformat() if self.first else None,
+            'to': datetime.fromtimestamp(self.last).isoformat() if self.last else None,
+            'restart_counter': self.restart_counter,
+            'restarts': self.restarts,
+            'test_resets': self.test_resets,
+            'uptime_percentage': round(self.uptime_percentage, 3),
+            'results': {test: dict(counts) for test, counts in sorted(self.results.items())},
+            'daily': {day: {test: dict(counts) for test, counts in tests.items()}
+                      for day, tests in sorted(self.daily.items())},
+        }
+
+
+def port_logs(paths: Sequence[str]) -> Dict[str, List[str]]:
+    """The serial log segments among `paths` per port, oldest first.
+
+    Anything not named like a serial log segment, such as the .idx sidecars a shell glob also
+    matches, is left out.
+    """
+    by_port: Dict[str, List[str]] = defaultdict(list)
+    for path in paths:
+        match = LOG_NAME.fullmatch(os.path.basename(path))
+        if match and path not in by_port[match.group('port')]:
+            by_port[match.group('port')].append(path)
+    for port, segments in by_port.items():
+        live = os.path.join(os.path.dirname(segments[0]), f"serial_log_{port}.txt")
+        order = {os.path.abspath(segment): position for position, segment in enumerate(log_segments(live))}
+        segments.sort(key=lambda segment: order.get(os.path.abspath(segment), len(order)))
+    return by_port
+
+
+def analyze(paths: Sequence[str], workers: Optional[int] = None,
+            chunk_size: int = CHUNK_SIZE) -> List[PortStatistics]:
+    """Scans the logs in parallel chunks and returns the statistics per port (rotated files are merged)."""
+    tasks = []
+    ports = port_logs(paths)
+    for port, path in ((port, path) for port, segments in ports.items() for path in segments):
+        size = os.path.getsize(path)
+        if path.endswith(COMPRESSED_EXT):
+            tasks.append((port, path, 0, size))  # Rotated segments are small enough to decompress in one piece
+            continue
+        tasks.extend((port, path, offset, min(offset + chunk_size, size))
+                     for offset in range(0, max(size, 1), chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = list(pool.map(_scan_task, [task[1:] for task in tasks]))
+
+    by_port: Dict[str, List[ChunkResult]] = defaultdict(list)
+    for (port, _, _, _), chunk in zip(tasks, chunks):
+        by_port[port].append(chunk)
+    statistics = []
+    for port, port_chunks in sorted(by_port.items()):
+        port_statistics = PortStatistics(port)
+        port_statistics.fold(port_chunks)
+        statistics.append(port_statistics)
+    return statistics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild modem test statistics from serial_log files.")
+    parser.add_argument('logs', nargs='+', help="serial_log_<port>[_<date>[.<n>]].txt[.gz] files")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE // (1024 * 1024))
+    parser.add_argument('--json', action='store_true', help="print the statistics as JSON")
+    args = parser.parse_args()
+
+    statistics = analyze(args.logs, args.workers, args.chunk_mb * 1024 * 1024)
+    if args.json:
+        print(json.dumps([port.as_dict() for port in statistics], indent=2))
+        return
+    for port in statistics:
+        summary = port.as_dict()
+        print(f"Port {port.port}: {summary['from']} - {summary['to']} ({port.bytes_scanned / 1024 / 1024:.1f} MB)")
+        print(f"Modem restarts: {port.restart_counter} (plus {port.test_resets} caused by tests)")
+        print(f"Uptime percentage: {port.uptime_percentage:.2f}%")
+        for test, counts in summary['results'].items():
+            total = counts['successful'] + counts['failed']
+            print(f"{test} tests: {total}, successful: {counts['successful']}, failed: {counts['failed']}")
+        print("---------------------------------------------")
+
+
+if __name__ == "__main__":
+    main()
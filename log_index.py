@@ -0,0 +1,213 @@
+import argparse
+import bisect
+import functools
+import os
+import re
+import struct
+import sys
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from log_rotation import COMPRESSED_EXT, log_segments, open_log
+
+# One record per indexed line: its timestamp and the byte offset where the line starts
+INDEX_RECORD = struct.Struct('<dQ')
+DEFAULT_EVERY = 256
+# Serial logs start every line with the time; odczyt_licznika logs start every cycle with 'Timestamp:'
+LINE_TIMESTAMP = re.compile(rb"(?:Timestamp: )?(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(\.\d{3})?")
+# On Windows the text-mode log writers turn every '\n' into '\r\n'
+NEWLINE_EXTRA_BYTES = len(os.linesep) - 1
+# How far out of order lines may be written (producers timestamp them before they reach the writer
+# thread); a range query reads this far past its end before it stops
+REORDER_WINDOW = 60.0
+
+
+def index_path(log_path: str) -> str:
+    return log_path + '.idx'
+
+
+@functools.lru_cache(maxsize=1024)
+def _seconds(text: bytes) -> float:
+    # Consecutive lines mostly share their second, so strptime runs once per second of log
+    return datetime.strptime(text.decode(), "%Y-%m-%d %H:%M:%S").timestamp()
+
+
+def parse_timestamp(line: bytes) -> Optional[float]:
+    """Timestamp at the start of a log line, or None for lines that do not start with one."""
+    match = LINE_TIMESTAMP.match(line)
+    if match is None:
+        return None
+    fraction = float(match.group(2)) if match.group(2) else 0.0
+    return _seconds(match.group(1)) + fraction
+
+
+def read_index(log_path: str) -> Tuple[List[float], List[int]]:
+    """Timestamps and offsets of the indexed lines, in file order."""
+    try:
+        with open(index_path(log_path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], []
+    usable = len(data) - len(data) % INDEX_RECORD.size  # Ignore a record cut short by a crash
+    records = list(INDEX_RECORD.iter_unpack(data[:usable]))
+    return [timestamp for timestamp, _ in records], [offset for _, offset in records]
+
+
+class IndexWriter:
+    """Appends a record for every `every`-th timestamped line of a log as it is written.
+
+    Lines may arrive slightly out of order, so each record holds the latest timestamp of all lines
+    up to its own rather than the line's: the index stays sorted for bisect, and no line before a
+    record is newer than it. Records are buffered and written by flush(), which callers invoke
+    after flushing the log itself, so the index never points past the data on disk.
+    """
+
+    def __init__(self, log_path: str, every: int = DEFAULT_EVERY) -> None:
+        self.log_path = log_path
+        self.every = every
+        self.records = 0
+        self._count = 0
+        self._pending = bytearray()
+        timestamps, offsets = read_index(log_path)
+        self._latest = timestamps[-1] if timestamps else float('-inf')
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        # Offsets of compressed segments are in the decompressed data, so only plain files can be checked
+        if offsets and offsets[-1] >= log_size and not log_path.endswith(COMPRESSED_EXT):
+            # The log was replaced or truncated under the index; start again
+            os.remove(index_path(log_path))
+            self._latest = float('-inf')
+        self._file: BinaryIO = open(index_path(log_path), 'ab')
+
+    def add(self, timestamp: float, offset: int) -> None:
+        if timestamp > self._latest:
+            self._latest = timestamp
+        if self._count % self.every == 0:
+            self._pending += INDEX_RECORD.pack(self._latest, offset)
+            self.records += 1
+        self._count += 1
+
+    def skip(self) -> None:
+        """Counts a line without indexing it, e.g. one whose record is already in the index."""
+        self._count += 1
+
+    def flush(self) -> None:
+        if self._pending:
+            self._file.write(self._pending)
+            self._file.flush()
+            self._pending = bytearray()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+
+def update_index(log_path: str, every: int = DEFAULT_EVERY) -> int:
+    """Indexes the part of a log written since its last index record; returns the records added.
+
+    Lets logs written without an index (or by an older version) be indexed incrementally.
+    """
+    writer = IndexWriter(log_path, every)
+    _, offsets = read_index(log_path)
+    with open_log(log_path) as log:
+        offset = offsets[-1] if offsets else 0
+        log.seek(offset)
+        if offsets:
+            offset += len(log.readline())  # The line of the last record is indexed already
+            writer.skip()
+        for line in log:
+            timestamp = parse_timestamp(line)
+            if timestamp is not None:
+                writer.add(timestamp, offset)
+            offset += len(line)
+    writer.close()
+    return writer.records
+
+
+def find_offset(log_path: str, start: float) -> int:
+    """Offset of the last indexed line before `start` (0 if there is none).
+
+    Every line before that offset is older than `start`, however out of order the log is.
+    """
+    timestamps, offsets = read_index(log_path)
+    position = bisect.bisect_left(timestamps, start) - 1
+    return offsets[position] if position >= 0 else 0
+
+
+def iter_range(log_path: str, start: float, end: float) -> Iterator[bytes]:
+    """Lines logged in [start, end); lines without a timestamp go with the line above them.
+
+    Seeks straight to the nearest indexed line before `start`, so only the lines between it and
+    the end of the range are read (compressed segments are decompressed up to that point). Lines
+    written out of order are skipped, not taken as the end; reading stops `REORDER_WINDOW` past it.
+    """
+    with open_log(log_path) as log:
+        log.seek(find_offset(log_path, start))
+        inside = False
+        for line in log:
+            timestamp = parse_timestamp(line)
+            if timestamp is not None:
+                if timestamp >= end + REORDER_WINDOW:
+                    break
+                inside = start <= timestamp < end
+            if inside:
+                yield line
+
+
+def iter_log_range(log_path: str, start: float, end: float) -> Iterator[bytes]:
+    """Lines logged in [start, end) across the rotated segments of a log and the live file.
+
+    The first record of each segment's index is its first line, so only the segments that
+    overlap the range are opened. Rotated segments without an index are indexed first; the live
+    log may still be growing, so without an index it is scanned from the start instead.
+    """
+    segments = log_segments(log_path)
+    firsts = []
+    for segment in segments:
+        if not os.path.exists(index_path(segment)) and segment != log_path:
+            update_index(segment)
+        timestamps, _ = read_index(segment)
+        firsts.append(timestamps[0] if timestamps else None)
+    for position, segment in enumerate(segments):
+        if firsts[position] is not None and firsts[position] >= end + REORDER_WINDOW:
+            break
+        following = next((first for first in firsts[position + 1:] if first is not None), None)
+        if following is not None and following + REORDER_WINDOW <= start:
+            continue  # The next segment starts before the range
+        yield from iter_range(segment, start, end)
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build and query sparse timestamp indexes of log files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index the unindexed tail of each log")
+    build.add_argument('logs', nargs='+')
+    build.add_argument('--every', type=int, default=DEFAULT_EVERY)
+    query = commands.add_parser('query', help="print the lines of a time range")
+    query.add_argument('log', help="live log; its rotated and compressed segments are searched too")
+    query.add_argument('--from', dest='start', help="start time, e.g. '2026-10-13 02:00'")
+    query.add_argument('--to', dest='end', help="end time (exclusive)")
+    query.add_argument('--around', help="centre of the range instead of --from/--to")
+    query.add_argument('--minutes', type=float, default=10, help="width of the --around range")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for log in args.logs:
+            print(f"{log}: {update_index(log, args.every)} records added")
+        return
+    if args.around:
+        centre = datetime.fromisoformat(args.around)
+        half = timedelta(minutes=args.minutes / 2)
+        start, end = (centre - half).timestamp(), (centre + half).timestamp()
+    else:
+        start = _parse_time(args.start) if args.start else 0.0
+        end = _parse_time(args.end) if args.end else float('inf')
+    for line in iter_log_range(args.log, start, end):
+        sys.stdout.buffer.write(line)
+
+
+if __name__ == "__main__":
+    main()
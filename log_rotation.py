@@ -0,0 +1,178 @@
+import argparse
+import glob
+import gzip
+import logging
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from typing import BinaryIO, Iterator, List, Optional
+
+COMPRESSED_EXT = '.gz'
+
+
+def open_log(path: str) -> BinaryIO:
+    """Opens a live or rotated log segment for reading; compressed segments are decompressed on the fly."""
+    if path.endswith(COMPRESSED_EXT):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _segment_pattern(path: str) -> re.Pattern:
+    root, ext = os.path.splitext(os.path.basename(path))
+    # <root>[_<date>][.<n>]<ext>[.gz]: daily rotations add the date, size rotations a sequence number
+    return re.compile(re.escape(root) + r"(?:_\d{4}-\d\d-\d\d)?(?:\.\d+)?" + re.escape(ext)
+                      + f"(?:{re.escape(COMPRESSED_EXT)})?$")
+
+
+def log_segments(path: str) -> List[str]:
+    """The rotated segments of a log, oldest first, followed by the live file if it exists.
+
+    Segments are ordered by modification time, which compression preserves.
+    """
+    directory = os.path.dirname(path) or '.'
+    root, _ = os.path.splitext(os.path.basename(path))
+    pattern = _segment_pattern(path)
+    candidates = glob.glob(os.path.join(glob.escape(directory), glob.escape(root) + '*'))
+    rotated = [candidate for candidate in candidates
+               if pattern.match(os.path.basename(candidate)) and os.path.abspath(candidate) != os.path.abspath(path)]
+    rotated.sort(key=lambda segment: (os.path.getmtime(segment), segment))
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def iter_log_lines(path: str) -> Iterator[bytes]:
+    """Every line of a log across its compressed and live segments, in the order they were written."""
+    for segment in log_segments(path):
+        with open_log(segment) as f:
+            yield from f
+
+
+def free_segment_name(path: str) -> str:
+    """`path` if neither it nor its compressed form exists, else `<root>.<n><ext>` with the first free n."""
+    root, ext = os.path.splitext(path)
+    candidate, n = path, 0
+    while os.path.exists(candidate) or os.path.exists(candidate + COMPRESSED_EXT):
+        n += 1
+        candidate = f"{root}.{n}{ext}"
+    return candidate
+
+
+def prune_segments(path: str, keep: int) -> List[str]:
+    """Deletes all but the newest `keep` rotated segments of a log (and their sidecars); returns the deleted."""
+    rotated = log_segments(path)
+    if os.path.exists(path):
+        rotated = rotated[:-1]
+    deleted = rotated[:max(0, len(rotated) - keep)]
+    for segment in deleted:
+        for name in [segment] + _sidecars(segment):
+            try:
+                os.remove(name)
+            except OSError as e:
+                logging.error(f"Failed to delete {name}: {e}")
+    return deleted
+
+
+def _sidecars(path: str) -> List[str]:
+    """Files such as `<segment>.idx` that belong to a segment."""
+    return [name for name in glob.glob(glob.escape(path) + '.*')
+            if not name.startswith(path + COMPRESSED_EXT)]
+
+
+def compress_file(path: str) -> Optional[str]:
+    """Gzips a finished segment next to itself and removes the original; returns the compressed path.
+
+    The data is written to a temporary file and renamed into place, so a crash never leaves a
+    truncated .gz behind. Sidecars (`<segment>.idx` -> `<segment>.gz.idx`) follow the segment.
+    """
+    target = path + COMPRESSED_EXT
+    temporary = target + '.tmp'
+    try:
+        with open(path, 'rb') as source, gzip.open(temporary, 'wb', compresslevel=6) as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        shutil.copystat(path, temporary)
+        os.replace(temporary, target)
+        os.remove(path)
+        for sidecar in _sidecars(path):
+            os.replace(sidecar, target + sidecar[len(path):])
+    except OSError as e:
+        logging.error(f"Failed to compress {path}: {e}")
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        return None
+    return target
+
+
+class Compressor(threading.Thread):
+    """Compresses rotated segments one at a time on a background thread, off the writers' paths."""
+
+    def __init__(self) -> None:
+        super().__init__(name="LogCompressor", daemon=True)
+        self._queue = queue.Queue()
+        self.compressed = 0
+
+    def submit(self, path: str) -> None:
+        self._queue.put(path)
+
+    def run(self) -> None:
+        while True:
+            path = self._queue.get()
+            if compress_file(path):
+                self.compressed += 1
+            self._queue.task_done()
+
+    def wait(self) -> None:
+        """Blocks until every submitted segment has been compressed."""
+        self._queue.join()
+
+
+_compressor: Optional[Compressor] = None
+_compressor_lock = threading.Lock()
+
+
+def compress_later(path: str) -> Compressor:
+    """Queues a segment for the process-wide compressor thread, starting it on first use."""
+    global _compressor
+    with _compressor_lock:
+        if _compressor is None:
+            _compressor = Compressor()
+            _compressor.start()
+    _compressor.submit(path)
+    return _compressor
+
+
+def compress_leftovers(path: str) -> int:
+    """Queues the rotated segments of a log that are still uncompressed, e.g. after a crash; returns the count.
+
+    A `.gz.tmp` left by a compression the crash interrupted is deleted first.
+    """
+    leftovers = [segment for segment in log_segments(path)
+                 if segment != path and not segment.endswith(COMPRESSED_EXT)]
+    for segment in leftovers:
+        temporary = segment + COMPRESSED_EXT + '.tmp'
+        if os.path.exists(temporary):
+            try:
+                os.remove(temporary)
+            except OSError as e:
+                logging.error(f"Failed to delete {temporary}: {e}")
+        compress_later(segment)
+    return len(leftovers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="List or print a log across its compressed and live segments.")
+    parser.add_argument('log', help="path of the live log, e.g. logs/serial_log__dev_ttyUSB0.txt")
+    parser.add_argument('--list', action='store_true', help="only list the segments, oldest first")
+    args = parser.parse_args()
+
+    if args.list:
+        for segment in log_segments(args.log):
+            print(f"{segment}\t{os.path.getsize(segment)}")
+        return
+    for line in iter_log_lines(args.log):
+        sys.stdout.buffer.write(line)
+
+
+if __name__ == "__main__":
+    main()
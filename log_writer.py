@@ -0,0 +1,166 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from log_index import DEFAULT_EVERY, NEWLINE_EXTRA_BYTES, IndexWriter, index_path
+from log_rotation import compress_later, compress_leftovers, free_segment_name, prune_segments
+
+
+class LogWriter(threading.Thread):
+    """Appends timestamped lines to a log file from a background thread.
+
+    Callers only enqueue records; the writer keeps the file open, batches records and flushes
+    when `flush_bytes` are pending or `flush_interval` seconds have passed. With rotate_daily the
+    current file is renamed to `<name>_<YYYY-MM-DD><ext>` when the first record of a new day arrives,
+    and with max_bytes also once it reaches that size (further segments of a day get `.<n>` before
+    the extension). Rotated segments are gzipped by a background thread unless compress is False,
+    and only the newest `keep_segments` are kept (0 keeps all).
+    Every `index_every`-th line is recorded in a `<name><ext>.idx` sidecar (see log_index), which
+    is rotated with the log; 0 disables the index.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, flush_bytes: int = 64 * 1024, flush_interval: float = 1.0,
+                 rotate_daily: bool = True, max_queue: int = 100000, index_every: int = DEFAULT_EVERY,
+                 max_bytes: int = 0, compress: bool = True, keep_segments: int = 0) -> None:
+        super().__init__(name=f"LogWriter-{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.rotate_daily = rotate_daily
+        self.index_every = index_every
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.keep_segments = keep_segments
+        self.dropped_records = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._file_date = None
+        self._index: Optional[IndexWriter] = None
+        self._offset = 0  # Byte offset the next appended line will start at
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._closed = False
+        atexit.register(self.close)
+
+    def write(self, message: str, timestamp: Optional[float] = None) -> None:
+        """Queues one line without blocking; it is timestamped with the time of this call."""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((timestamp or time.time(), message))
+        except queue.Full:
+            self.dropped_records += 1
+
+    def _open(self, day) -> None:
+        if self.rotate_daily and os.path.exists(self.path):
+            file_day = datetime.fromtimestamp(os.path.getmtime(self.path)).date()
+            if file_day < day:
+                self._rotate(file_day)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._file_date = day
+        self._offset = os.path.getsize(self.path)
+        if self.index_every:
+            self._index = IndexWriter(self.path, self.index_every)
+
+    def _rotate(self, day) -> None:
+        base, ext = os.path.splitext(self.path)
+        target = free_segment_name(f"{base}_{day.strftime('%Y-%m-%d')}{ext}")
+        try:
+            os.replace(self.path, target)
+            if os.path.exists(index_path(self.path)):
+                os.replace(index_path(self.path), index_path(target))
+        except OSError as e:
+            logging.error(f"Failed to rotate {self.path}: {e}")
+            return
+        if self.compress:
+            compress_later(target)
+        if self.keep_segments:
+            prune_segments(self.path, self.keep_segments)
+
+    def _append(self, timestamp: float, message: str) -> None:
+        moment = datetime.fromtimestamp(timestamp)
+        day = moment.date()
+        if self._file is None:
+            self._open(day)
+        elif (self.rotate_daily and day != self._file_date) or (self.max_bytes and self._offset >= self.max_bytes):
+            self._flush()
+            self._close_file()
+            self._rotate(self._file_date)
+            self._open(day)
+
+        line = f"{moment.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} - {message}\n"
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        if self._index is not None:
+            self._index.add(timestamp, self._offset)
+        size = len(line) if line.isascii() else len(line.encode('utf-8'))
+        self._offset += size + line.count('\n') * NEWLINE_EXTRA_BYTES if NEWLINE_EXTRA_BYTES else size
+
+    def _flush(self) -> None:
+        if not self._pending or self._file is None:
+            return
+        try:
+            self._file.write("".join(self._pending))
+            self._file.flush()
+        except OSError as e:
+            logging.error(f"Failed to write {self.path}: {e}")
+        else:
+            if self._index is not None:
+                self._index.flush()
+        self._pending = []
+        self._pending_bytes = 0
+
+    def _close_file(self) -> None:
+        self._file.close()
+        self._file = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def run(self) -> None:
+        if self.compress:
+            compress_leftovers(self.path)
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = None
+
+            if record is self._STOP:
+                break
+            if record is not None:
+                self._append(*record)
+
+            if self._pending_bytes >= self.flush_bytes or time.monotonic() >= deadline:
+                self._flush()
+                deadline = time.monotonic() + self.flush_interval
+
+        # Write out whatever was queued before close() was called
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not self._STOP:
+                self._append(*record)
+        self._flush()
+        if self._file:
+            self._close_file()
+
+    def close(self) -> None:
+        """Flushes all queued records and closes the file."""
+        if self._closed:
+            return
+        self._closed = True
+        if self.is_alive():
+            self._queue.put(self._STOP)
+            self.join()
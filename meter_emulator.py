@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import logging
+import random
+import struct
+import time
+from typing import List, Optional
+
+from dlms import WRAPPER_VERSION, FrameError, WrapperFrame, read_frame_async
+
+# AARE accepting the association (LN referencing, no ciphering), as sent by our meters
+AARE_ACCEPTED = bytes.fromhex("6129A109060760857405080101A203020100A305A103020100"
+                              "BE10040E0800065F1F040000181F01F40007")
+AARE_REJECTED = bytes.fromhex("611FA109060760857405080101A203020101A305A103020101BE0604040E010601")
+RLRE_NORMAL = bytes.fromhex("6303800100")
+CLOCK_CLASS = 8
+
+
+def _clock_value() -> bytes:
+    now = time.localtime()
+    # octet-string(12) date-time: year, month, day, weekday, hour, minute, second, hundredths,
+    # deviation (not specified), clock status
+    return bytes([0x09, 0x0C]) + struct.pack('>HBBBBBBBhB', now.tm_year, now.tm_mon, now.tm_mday,
+                                             now.tm_wday + 1, now.tm_hour, now.tm_min, now.tm_sec, 0,
+                                             -0x8000, 0)
+
+
+def _register_value(value: int) -> bytes:
+    return bytes([0x06]) + struct.pack('>I', value & 0xFFFFFFFF)  # double-long-unsigned
+
+
+def get_response(apdu: bytes, counter: int) -> bytes:
+    """GET-Response for a GET-Request-Normal or -WithList: clocks get the time, anything else a counter."""
+    kind, invoke_id = apdu[1], apdu[2]
+    if kind == 0x01:
+        class_id = struct.unpack('>H', apdu[3:5])[0] if len(apdu) >= 5 else 0
+        data = _clock_value() if class_id == CLOCK_CLASS else _register_value(counter)
+        return bytes([0xC4, 0x01, invoke_id, 0x00]) + data
+    if kind == 0x03:
+        count = apdu[3] if len(apdu) > 3 else 0
+        results = b"".join(bytes([0x00]) + _register_value(counter + i) for i in range(count))
+        return bytes([0xC4, 0x03, invoke_id, count]) + results
+    return bytes([0xC4, 0x01, invoke_id, 0x01, 0x03])  # data-access-result: read-write-denied
+
+
+class MeterOptions:
+    """Timing and failure injection shared by all emulated meters."""
+
+    def __init__(self, latency: float = 0.02, jitter: float = 0.01, fragment: int = 0, silent_rate: float = 0,
+                 disconnect_rate: float = 0, reject_rate: float = 0, refuse_rate: float = 0) -> None:
+        self.latency = latency  # Delay before each response, plus up to `jitter`
+        self.jitter = jitter
+        self.fragment = fragment  # Largest TCP write in bytes; 0 sends each frame at once
+        self.silent_rate = silent_rate  # Probability that a request gets no response (client times out)
+        self.disconnect_rate = disconnect_rate  # Probability that a request makes the meter drop the connection
+        self.reject_rate = reject_rate  # Probability that an AARQ is answered with a rejecting AARE
+        self.refuse_rate = refuse_rate  # Probability that a new connection is closed straight away
+
+
+class MeterEmulator:
+    """Emulates `count` DLMS/COSEM meters on consecutive TCP ports of one host, in one event loop.
+
+    Answers AARQ with AARE, RLRQ with RLRE and GET requests with GET responses in wrapper frames,
+    so odczyt_licznika.py, the meter poller and the fleet can be run without hardware.
+    """
+
+    def __init__(self, count: int, host: str = '127.0.0.1', base_port: int = 4059,
+                 options: Optional[MeterOptions] = None) -> None:
+        self.count = count
+        self.host = host
+        self.base_port = base_port
+        self.options = options or MeterOptions()
+        self.servers: List[asyncio.AbstractServer] = []
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def meters(self) -> List[str]:
+        return [f"{self.host}:{self.base_port + i}" for i in range(self.count)]
+
+    def _response(self, frame: WrapperFrame) -> Optional[bytes]:
+        tag = frame.apdu[0] if frame.apdu else None
+        if tag == 0x60:
+            apdu = AARE_REJECTED if random.random() < self.options.reject_rate else AARE_ACCEPTED
+        elif tag == 0x62:
+            apdu = RLRE_NORMAL
+        elif tag == 0xC0 and len(frame.apdu) >= 3:
+            apdu = get_response(frame.apdu, self.requests)
+        else:
+            apdu = bytes([0x0E, 0x01, 0x06, 0x00])  # confirmedServiceError: service not supported
+        return WrapperFrame(WRAPPER_VERSION, frame.destination, frame.source, apdu).raw
+
+    async def _write(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        size = self.options.fragment or len(data)
+        for offset in range(0, len(data), size):
+            writer.write(data[offset:offset + size])
+            await writer.drain()
+            if offset + size < len(data):
+                await asyncio.sleep(0.001)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            if random.random() < self.options.refuse_rate:
+                return
+            while True:
+                frame = await read_frame_async(reader)
+                if frame is None:
+                    break
+                self.requests += 1
+                if random.random() < self.options.disconnect_rate:
+                    break
+                if random.random() < self.options.silent_rate:
+                    continue
+                await asyncio.sleep(self.options.latency + random.uniform(0, self.options.jitter))
+                await self._write(writer, self._response(frame))
+        except (ConnectionError, FrameError) as e:
+            logging.debug(f"Meter connection ended: {e}")
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        for i in range(self.count):
+            self.servers.append(await asyncio.start_server(self._serve, self.host, self.base_port + i))
+
+    async def stop(self) -> None:
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        logging.info(f"Emulating {self.count} meters on {self.host}:{self.base_port}-{self.base_port + self.count - 1}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Emulate DLMS/COSEM meters over TCP.")
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=4059)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--fragment', type=int, default=0, help="largest write in bytes (0 = whole frames)")
+    parser.add_argument('--silent-rate', type=float, default=0)
+    parser.add_argument('--disconnect-rate', type=float, default=0)
+    parser.add_argument('--reject-rate', type=float, default=0)
+    parser.add_argument('--refuse-rate', type=float, default=0)
+    parser.add_argument('--meters-file', help="write the emulated meters as a fleet meters file")
+    args = parser.parse_args()
+
+    emulator = MeterEmulator(args.count, args.host, args.base_port, MeterOptions(
+        args.latency, args.jitter, args.fragment, args.silent_rate, args.disconnect_rate, args.reject_rate,
+        args.refuse_rate))
+    if args.meters_file:
+        with open(args.meters_file, 'w') as f:
+            f.write("\n".join(emulator.meters) + "\n")
+    try:
+        asyncio.run(emulator.serve_forever())
+    except KeyboardInterrupt:
+        logging.info("Meter emulator stopped by user.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
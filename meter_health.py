@@ -0,0 +1,150 @@
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RttEstimator:
+    """Retransmission-style timeout from a smoothed RTT and its mean deviation (RFC 6298).
+
+    Each sample updates SRTT and RTTVAR with gains 1/8 and 1/4; the timeout is SRTT + 4 * RTTVAR,
+    kept within [min_timeout, max_timeout]. Before the first sample it is max_timeout, and each
+    timeout doubles it (Karn's backoff) until the next sample brings it back down.
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, min_timeout: float = 1.0, max_timeout: float = 5.0) -> None:
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.max_timeout = max_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self._timeout = max_timeout
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    def observe(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self._timeout = min(self.max_timeout, max(self.min_timeout, self.srtt + self.K * self.rttvar))
+
+    def timed_out(self) -> None:
+        self._timeout = min(self.max_timeout, self._timeout * 2)
+
+
+class CircuitBreaker:
+    """Stops polling a meter after `failure_threshold` failed cycles in a row.
+
+    While open, the meter is skipped until its retry time; then a single probe cycle is allowed
+    (half-open). A successful probe closes the breaker, a failed one reopens it with the wait
+    doubled, from `backoff` up to `backoff_max` seconds.
+    """
+
+    def __init__(self, failure_threshold: int = 3, backoff: float = 30, backoff_max: float = 3600) -> None:
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.state = CLOSED
+        self.failures = 0  # Consecutive failed cycles
+        self.trips = 0  # Consecutive openings, for the backoff
+        self.retry_at = 0.0
+        self.skipped = 0
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Whether the meter should be polled now; counts the cycles it is skipped."""
+        if self.state == OPEN:
+            if (time.monotonic() if now is None else now) < self.retry_at:
+                self.skipped += 1
+                return False
+            self.state = HALF_OPEN
+        return True
+
+    def record(self, success: bool, now: Optional[float] = None) -> None:
+        if success:
+            self.state = CLOSED
+            self.failures = 0
+            self.trips = 0
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trips += 1
+            self.state = OPEN
+            delay = min(self.backoff_max, self.backoff * 2 ** (self.trips - 1))
+            self.retry_at = (time.monotonic() if now is None else now) + delay
+
+    def retry_in(self, now: Optional[float] = None) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.retry_at - (time.monotonic() if now is None else now))
+
+
+class MeterHealth(NamedTuple):
+    """Adaptive timeout and circuit breaker of one meter."""
+    estimator: RttEstimator
+    breaker: CircuitBreaker
+
+
+class HealthTracker:
+    """Per-meter adaptive timeouts and circuit breakers, created on first use.
+
+    `max_timeout` is the configured socket timeout: a meter never waits longer than it did before,
+    and meters with a known RTT wait much less. With adaptive=False every meter keeps max_timeout.
+    """
+
+    def __init__(self, max_timeout: float = 5.0, min_timeout: float = 1.0, adaptive: bool = True,
+                 failure_threshold: int = 3, backoff: float = 30, backoff_max: float = 3600) -> None:
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.adaptive = adaptive
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.meters: Dict[str, MeterHealth] = {}
+
+    def get(self, name: str, max_timeout: Optional[float] = None) -> MeterHealth:
+        health = self.meters.get(name)
+        if health is None:
+            health = MeterHealth(RttEstimator(self.min_timeout, max_timeout or self.max_timeout),
+                                 CircuitBreaker(self.failure_threshold, self.backoff, self.backoff_max))
+            self.meters[name] = health
+        return health
+
+    def timeout(self, name: str, max_timeout: Optional[float] = None) -> float:
+        health = self.get(name, max_timeout)
+        return health.estimator.timeout if self.adaptive else health.estimator.max_timeout
+
+    def allow(self, name: str) -> bool:
+        return self.get(name).breaker.allow()
+
+    def observe(self, name: str, rtt: float) -> None:
+        self.get(name).estimator.observe(rtt)
+
+    def timed_out(self, name: str) -> None:
+        self.get(name).estimator.timed_out()
+
+    def record(self, name: str, success: bool) -> None:
+        self.get(name).breaker.record(success)
+
+    def retry_in(self, name: str) -> float:
+        return self.get(name).breaker.retry_in()
+
+    def report(self) -> List[str]:
+        """One line per meter: its timeout, smoothed RTT and breaker state."""
+        lines = []
+        for name, health in sorted(self.meters.items()):
+            estimator, breaker = health.estimator, health.breaker
+            srtt = f"{estimator.srtt * 1000:.0f} ms" if estimator.srtt is not None else "-"
+            line = f"{name}: timeout {estimator.timeout:.2f} s, srtt {srtt}, breaker {breaker.state}"
+            if breaker.state != CLOSED or breaker.skipped:
+                line += f" (retry in {breaker.retry_in():.0f} s, skipped {breaker.skipped} cycles)"
+            lines.append(line)
+        return lines
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import binascii
+import logging
+import time
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional
+
+import odczyt_licznika
+from dlms import FrameError, apdu_name, read_frame_async
+from latency import LatencyTracker
+from meter_health import HealthTracker
+from results_store import ReadRecord, ResultsStore
+from odczyt_licznika import (OUTCOME_ERROR, OUTCOME_NO_RESPONSE, OUTCOME_PARTIAL, OUTCOME_SUCCESSFUL,
+                             OUTCOME_TIMEOUT, classify_read, data_to_send_hex_list)
+
+OUTCOMES = (OUTCOME_SUCCESSFUL, OUTCOME_PARTIAL, OUTCOME_NO_RESPONSE, OUTCOME_ERROR, OUTCOME_TIMEOUT)
+
+
+class Meter(NamedTuple):
+    ip_address: str
+    port: int
+    timeout: Optional[float] = None  # Falls back to the poller's timeout
+
+    @property
+    def name(self) -> str:
+        return f"{self.ip_address}:{self.port}"
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Meter':
+        """Parses 'ip:port' or 'ip:port:timeout'."""
+        parts = spec.split(':')
+        timeout = float(parts[2]) if len(parts) > 2 else None
+        return cls(parts[0], int(parts[1]), timeout)
+
+
+class PollResult(NamedTuple):
+    meter: Meter
+    outcome: str
+    reads_count: int
+    received: List[bytes]
+    error: Optional[str] = None
+
+
+async def async_send_and_receive_hex_data_tcp(hex_data_list: List[str], meter: Meter, timeout: float,
+                                              latency: Optional[LatencyTracker] = None,
+                                              health: Optional[HealthTracker] = None) -> PollResult:
+    """Asyncio counterpart of odczyt_licznika.send_and_receive_hex_data_tcp for a single meter.
+
+    Sends every frame and waits for one response per frame; the outcome uses the same categories
+    as the sequential poller. Connect, per-APDU and cycle times go to `latency` if given; response
+    times and timeouts feed the meter's adaptive timeout in `health`.
+    """
+    reads_count = 0
+    received = []
+    writer = None
+    cycle_start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(meter.ip_address, meter.port), timeout)
+        if latency:
+            latency.record(meter.name, 'connect', time.perf_counter() - cycle_start)
+        for hex_data in hex_data_list:
+            binary_data = binascii.unhexlify(hex_data)
+            request_start = time.perf_counter()
+            writer.write(binary_data)
+            await writer.drain()
+            try:
+                frame = await asyncio.wait_for(read_frame_async(reader), timeout)
+            except asyncio.TimeoutError:
+                if health:
+                    health.timed_out(meter.name)
+                # A late or partial response would be read as the answer to the next frame, so the
+                # connection is not used again; the remaining frames count as unanswered
+                break
+            if frame:
+                rtt = time.perf_counter() - request_start
+                if latency:
+                    latency.record(meter.name, apdu_name(binary_data), rtt)
+                if health:
+                    health.observe(meter.name, rtt)
+                received.append(frame.raw)
+                reads_count += 1
+    except asyncio.TimeoutError:
+        if health:
+            health.timed_out(meter.name)
+        return PollResult(meter, OUTCOME_TIMEOUT, reads_count, received, "TCP connection timeout.")
+    except (OSError, FrameError) as e:
+        return PollResult(meter, OUTCOME_ERROR, reads_count, received, str(e))
+    finally:
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        if latency:
+            latency.record(meter.name, 'cycle', time.perf_counter() - cycle_start)
+
+    return PollResult(meter, classify_read(reads_count, len(hex_data_list)), reads_count, received)
+
+
+class MeterPoller:
+    """Polls many meters concurrently, with at most `concurrency` connections open at a time.
+
+    Each meter waits for responses with its own adaptive timeout (at most its configured one), and
+    meters whose circuit breaker is open are skipped without taking a connection slot, so a few
+    dead meters do not hold up the rest of the fleet.
+    """
+
+    def __init__(self, meters: Iterable[Meter], hex_data_list: List[str] = None,
+                 concurrency: int = 100, timeout: float = 5, store: Optional[ResultsStore] = None,
+                 health: Optional[HealthTracker] = None) -> None:
+        self.meters = list(meters)
+        self.hex_data_list = hex_data_list or data_to_send_hex_list
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cycles = 0
+        self.totals = Counter({outcome: 0 for outcome in OUTCOMES})
+        self.skipped = 0
+        self.latency = LatencyTracker()
+        self.health = health or HealthTracker(timeout)
+        self.store = store
+
+    async def _poll_meter(self, meter: Meter, semaphore: asyncio.Semaphore) -> Optional[PollResult]:
+        if not self.health.allow(meter.name):
+            return None
+        async with semaphore:
+            timeout = self.health.timeout(meter.name, meter.timeout or self.timeout)
+            result = await async_send_and_receive_hex_data_tcp(self.hex_data_list, meter, timeout, self.latency,
+                                                               self.health)
+        self.health.record(meter.name, result.outcome in (OUTCOME_SUCCESSFUL, OUTCOME_PARTIAL))
+        return result
+
+    async def poll_once(self) -> List[PollResult]:
+        """Polls every meter whose breaker allows it once and adds the outcomes to the running totals."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.time()
+        polled = await asyncio.gather(*(self._poll_meter(meter, semaphore) for meter in self.meters))
+        results = [result for result in polled if result is not None]
+        self.skipped += len(polled) - len(results)
+        self.cycles += 1
+        self.totals.update(result.outcome for result in results)
+        if self.store:
+            bytes_sent = sum(len(hex_data) // 2 for hex_data in self.hex_data_list)
+            for result in results:
+                self.store.add(ReadRecord(started, result.meter.name, result.outcome, result.reads_count,
+                                          len(self.hex_data_list), bytes_sent,
+                                          sum(len(data) for data in result.received), error=result.error))
+        return results
+
+    def accuracy(self) -> float:
+        """Percentage of all meter reads so far that were fully successful; skipped meters are not reads."""
+        total = sum(self.totals.values())
+        return (self.totals[OUTCOME_SUCCESSFUL] / total) * 100 if total else 0.0
+
+    async def run(self, num_retries: int, delay_between_runs: float, latency_report_every: int = 60) -> None:
+        for counter in range(1, num_retries + 1):
+            started = time.monotonic()
+            results = await self.poll_once()
+            cycle = Counter(result.outcome for result in results)
+            logging.info(f"Cycle {counter}/{num_retries}: {len(results)} meters in "
+                         f"{time.monotonic() - started:.2f} s, {dict(cycle)}")
+            print(f"Loop counter: {counter}/{num_retries}")
+            print(f"Meter reading accuracy: {self.accuracy():.2f}%")
+            print("Successful meter readings:", self.totals[OUTCOME_SUCCESSFUL])
+            print("Incomplete meter readings:", self.totals[OUTCOME_PARTIAL])
+            print("Meter not responding:", self.totals[OUTCOME_NO_RESPONSE])
+            print("TCP connection error:", self.totals[OUTCOME_ERROR])
+            print("TCP timeout error:", self.totals[OUTCOME_TIMEOUT])
+            print("Meters skipped (circuit breaker open):", self.skipped)
+            if latency_report_every and counter % latency_report_every == 0:
+                print("\n".join(self.latency.report() + self.health.report()))
+                # Each report covers the cycles since the previous one, so a recent slowdown shows
+                self.latency.new_window()
+            print("---------------------------------------------")
+            await asyncio.sleep(delay_between_runs)
+        if latency_report_every:
+            print("Latency over the whole campaign:")
+            print("\n".join(self.latency.report(campaign=True)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Poll many meters concurrently.")
+    parser.add_argument('meters', nargs='*', help="meters as ip:port[:timeout]; defaults to odczyt_licznika.ini")
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--timeout', type=float, default=odczyt_licznika.socket_timeout)
+    parser.add_argument('--retries', type=int, default=odczyt_licznika.num_retries)
+    parser.add_argument('--delay', type=float, default=odczyt_licznika.delay_between_runs)
+    parser.add_argument('--results-db', default=odczyt_licznika.results_db, help="empty string disables the store")
+    parser.add_argument('--min-timeout', type=float, default=odczyt_licznika.min_timeout,
+                        help="lower bound of the adaptive timeout; --timeout is the upper bound")
+    parser.add_argument('--fixed-timeout', action='store_true', help="always wait --timeout, as before")
+    parser.add_argument('--breaker-failures', type=int, default=odczyt_licznika.breaker_failures,
+                        help="failed cycles in a row before a meter is skipped")
+    parser.add_argument('--breaker-backoff', type=float, default=odczyt_licznika.breaker_backoff,
+                        help="first wait in seconds before an open breaker is retried; doubles on each failure")
+    parser.add_argument('--breaker-backoff-max', type=float, default=odczyt_licznika.breaker_backoff_max)
+    args = parser.parse_args()
+
+    meters = [Meter.parse(spec) for spec in args.meters] or [Meter(odczyt_licznika.ip_address,
+                                                                   odczyt_licznika.port)]
+    store = ResultsStore(args.results_db) if args.results_db else None
+    health = HealthTracker(args.timeout, args.min_timeout, not args.fixed_timeout, args.breaker_failures,
+                           args.breaker_backoff, args.breaker_backoff_max)
+    poller = MeterPoller(meters, concurrency=args.concurrency, timeout=args.timeout, store=store, health=health)
+    try:
+        asyncio.run(poller.run(args.retries, args.delay))
+    finally:
+        if store:
+            store.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
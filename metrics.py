@@ -0,0 +1,215 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class _ShardedCells:
+    """One list of numbers per writer thread, so updates never contend on a lock.
+
+    Each thread only ever writes its own cell; readers sum all cells. Taking the lock is needed only
+    the first time a thread touches the metric.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        cell = getattr(self._local, 'cell', None)
+        if cell is None:
+            cell = [0] * self._size
+            with self._lock:
+                self._cells = self._cells + [cell]
+            self._local.cell = cell
+        return cell
+
+    def totals(self) -> List[float]:
+        totals = [0] * self._size
+        for cell in self._cells:
+            for i, value in enumerate(cell):
+                totals[i] += value
+        return totals
+
+    def reset(self, values: Sequence[float]) -> None:
+        """Replaces the total; concurrent updates from other threads during the reset may be lost."""
+        with self._lock:
+            for cell in self._cells:
+                cell[:] = [0] * self._size
+        self.cell()[:] = list(values)
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str]) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._cells = _ShardedCells(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+    def set(self, value: float) -> None:
+        """Restores a value, e.g. from a checkpoint; not meant for regular updates."""
+        self._cells.reset([value])
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"]
+
+
+class Gauge(Counter):
+    """A value that can go up and down; shares the sharded storage of Counter."""
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class Histogram:
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help_text: str, labels: Dict[str, str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # Per-bucket counts, then sum and count
+        self._cells = _ShardedCells(len(self.buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        cell = self._cells.cell()
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                cell[i] += 1
+                break
+        cell[-2] += value
+        cell[-1] += 1
+
+    def samples(self) -> List[str]:
+        totals = self._cells.totals()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, totals):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, ('le', _format_value(bound)))} "
+                         f"{_format_value(cumulative)}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labels, ('le', '+Inf'))} {_format_value(totals[-1])}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels)} {_format_value(totals[-2])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels)} {_format_value(totals[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Creates metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labels: Optional[Dict[str, str]], **kwargs):
+        labels = labels or {}
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, help_text, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        described = set()
+        for (name, _), metric in sorted(self._metrics.items(), key=lambda item: item[0]):
+            if name not in described:
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                described.add(name)
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves a registry at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9105) -> None:
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler) -> None:
+                if handler.path.split('?')[0] not in ('/metrics', '/'):
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args) -> None:
+                logging.debug(f"Metrics request: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricAttribute:
+    """Class attribute that reads (and, for restores, writes) a metric held in obj._metrics."""
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = obj._metrics[self.name].value
+        return int(value) if float(value).is_integer() else value
+
+    def __set__(self, obj, value) -> None:
+        obj._metrics[self.name].set(value)
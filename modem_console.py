@@ -0,0 +1,136 @@
+import logging
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from serial_reader import SerialReader, Subscription
+from stream_matcher import StreamMatch, StreamMatcher
+
+PROMPT = "debug >"
+LOGGED_IN = "LCT: OK logged in"
+UNKNOWN_COMMAND = r"nieznane polecenie '([^']+)'"
+
+# Step errors
+ERROR_TIMEOUT = 'timeout'
+ERROR_UNKNOWN_COMMAND = 'unknown_command'
+ERROR_NOT_LOGGED_IN = 'not_logged_in'
+
+
+class Step(NamedTuple):
+    command: str
+    expect: Optional[str] = None  # Echo or prompt that completes the step; None sends without waiting
+    timeout: float = 5
+    regex: bool = False  # Treat `expect` as a regular expression; its groups end up in the result
+    required: bool = True  # A missing reply fails the transaction; otherwise it is only logged
+
+
+class StepResult(NamedTuple):
+    command: str
+    ok: bool
+    elapsed: float
+    match: Optional[StreamMatch] = None
+    error: Optional[str] = None
+
+
+class TransactionResult(NamedTuple):
+    ok: bool
+    steps: List[StepResult]
+
+    @property
+    def error(self) -> Optional[str]:
+        failed = [step for step in self.steps if not step.ok]
+        return failed[0].error if failed else None
+
+    def value(self, index: int = -1, group: int = 0) -> str:
+        """A captured group of a step's reply, or an empty string if the step did not match."""
+        match = self.steps[index].match if self.steps else None
+        return match.groups[group].strip() if match and len(match.groups) > group else ""
+
+
+class ModemConsole:
+    """Runs command/response transactions on the modem's debug console.
+
+    Each step subscribes to the reader before writing, so its reply cannot be missed, and waits for
+    the expected echo or prompt with its own timeout. The admin login is cached for `login_ttl`
+    seconds, refreshed by every successful transaction and dropped when the modem restarts.
+    """
+
+    def __init__(self, reader: SerialReader, write: Callable[[bytes], None], password: str,
+                 login_ttl: float = 600) -> None:
+        self.reader = reader
+        self.write = write
+        self.password = password
+        self.login_ttl = login_ttl
+        self._logged_in_until = 0.0
+        self.logins = 0
+        self.cached_logins = 0
+
+    @staticmethod
+    def expect(subscription: Subscription, expected: str, timeout: float, regex: bool = False,
+               stop_on_unknown: bool = True) -> Optional[StreamMatch]:
+        """Waits for `expected`; logs 'unknown command' replies and, if asked, returns them as the match."""
+        def unknown_command(match: StreamMatch) -> None:
+            logging.warning(f"Skipping test due to unknown command: 'nieznane polecenie {match.groups[0]}'")
+
+        matcher = StreamMatcher()
+        matcher.register('unknown_command', UNKNOWN_COMMAND, unknown_command, regex=True, max_length=128)
+        matcher.register('expected', expected, regex=regex)
+        names = ('expected', 'unknown_command') if stop_on_unknown else ('expected',)
+        return subscription.wait_for_match(matcher, timeout, names=names)
+
+    def _run_step(self, step: Step) -> StepResult:
+        started = time.monotonic()
+        with self.reader.subscribe() as subscription:
+            self.write(f"{step.command}\n".encode())
+            if step.expect is None:
+                return StepResult(step.command, True, time.monotonic() - started)
+            match = self.expect(subscription, step.expect, step.timeout, step.regex)
+        elapsed = time.monotonic() - started
+        if match is None:
+            return StepResult(step.command, False, elapsed, error=ERROR_TIMEOUT)
+        if match.name == 'unknown_command':
+            return StepResult(step.command, False, elapsed, match, ERROR_UNKNOWN_COMMAND)
+        return StepResult(step.command, True, elapsed, match)
+
+    def transaction(self, steps: Sequence[Step], login: bool = True) -> TransactionResult:
+        """Runs the steps in order and stops at the first required step that fails."""
+        if login and not self.login():
+            return TransactionResult(False, [StepResult('login', False, 0.0, error=ERROR_NOT_LOGGED_IN)])
+        results = []
+        for step in steps:
+            result = self._run_step(step)
+            logging.debug(f"Console step {step.command!r}: ok={result.ok} in {result.elapsed:.2f}s")
+            if not result.ok and not step.required:
+                logging.warning(f"No reply to {step.command!r} ({result.error}), continuing")
+                result = result._replace(ok=True)
+            results.append(result)
+            if not result.ok:
+                if result.error == ERROR_TIMEOUT:
+                    self.invalidate_login()  # The console may have logged us out
+                return TransactionResult(False, results)
+        if login:
+            self._logged_in_until = time.monotonic() + self.login_ttl
+        return TransactionResult(True, results)
+
+    def is_debug_mode(self) -> bool:
+        """Sends an empty line and checks whether the debug prompt answers."""
+        with self.reader.subscribe() as subscription:
+            self.write(b'\n\r')
+            return self.expect(subscription, PROMPT, 3, stop_on_unknown=False) is not None
+
+    def login(self) -> bool:
+        """Logs in as admin unless a login (or an open debug prompt) is still cached."""
+        if time.monotonic() < self._logged_in_until:
+            self.cached_logins += 1
+            return True
+        if not self.is_debug_mode():
+            with self.reader.subscribe() as subscription:
+                self.write('login\n'.encode())
+                self.write(f'{self.password}\r\n'.encode())
+                if self.expect(subscription, LOGGED_IN, 45, stop_on_unknown=False) is None:
+                    return False
+            self.logins += 1
+        self._logged_in_until = time.monotonic() + self.login_ttl
+        return True
+
+    def invalidate_login(self) -> None:
+        self._logged_in_until = 0.0
@@ -0,0 +1,246 @@
+import argparse
+import heapq
+import itertools
+import logging
+import os
+import random
+import selectors
+import threading
+import time
+import tty
+from typing import List, Optional
+
+from modem_console import LOGGED_IN, PROMPT
+
+RESTART_BANNER = " Restart w ciagu 3 s"
+RESTARTED_BANNER = "Modul radiowy poprawnie wykryty i zainicjowany"
+RAT_BANNERS = {'lte': "RAT: LTE", '2g': "RAT: EDGE", 'auto': "RAT: LTE"}
+MODULE_BANNERS = {'1': "N27", '2': "N717"}
+
+
+class EmulatorOptions:
+    """Timing and failure injection shared by all emulated modems."""
+
+    def __init__(self, password: str = 'LZO212345', latency: float = 0.05, jitter: float = 0.02,
+                 fragment: int = 0, restart_time: float = 3, ping_time: float = 0.5, drop_rate: float = 0,
+                 ping_fail_rate: float = 0, restart_fail_rate: float = 0, spontaneous_restarts: float = 0) -> None:
+        self.password = password
+        self.latency = latency  # Delay before a reply, plus up to `jitter`
+        self.jitter = jitter
+        self.fragment = fragment  # Largest write to the pty in bytes; 0 sends each reply at once
+        self.restart_time = restart_time
+        self.ping_time = ping_time
+        self.drop_rate = drop_rate  # Probability that a command gets no reply at all
+        self.ping_fail_rate = ping_fail_rate
+        self.restart_fail_rate = restart_fail_rate  # Probability that a reset never reports the new RAT/module
+        self.spontaneous_restarts = spontaneous_restarts  # Unprompted restarts per modem per hour
+
+
+class EmulatedModem:
+    """One modem console behind a pty; the device name to open is `port`."""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.buffer = b""
+        self.logged_in = False
+        self.awaiting_password = False
+        self.settings = {'radio_mode': 'lte', 'active_radio': '1'}
+        self.saved = dict(self.settings)
+        self.restarting = False
+        self.commands = 0
+        self.busy_until = 0.0  # When the last queued reply has been written; later replies follow it
+
+    def close(self) -> None:
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class ModemEmulator:
+    """Emulates many modem consoles on pty pairs from a single thread.
+
+    Each pty master is registered with a selector; replies are queued on a heap with their due
+    time, so latency, fragmentation and restarts cost no threads however many modems there are.
+    """
+
+    def __init__(self, count: int, options: Optional[EmulatorOptions] = None) -> None:
+        self.options = options or EmulatorOptions()
+        self.modems = [EmulatedModem(index) for index in range(count)]
+        self.selector = selectors.DefaultSelector()
+        for modem in self.modems:
+            self.selector.register(modem.master, selectors.EVENT_READ, modem)
+        self._outgoing = []
+        self._sequence = itertools.count()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ports(self) -> List[str]:
+        return [modem.port for modem in self.modems]
+
+    def _delay(self) -> float:
+        return self.options.latency + random.uniform(0, self.options.jitter)
+
+    def _send(self, modem: EmulatedModem, text: str, delay: Optional[float] = None) -> None:
+        """Queues text for the modem after `delay`, split into fragments if configured.
+
+        Like a real console, a modem writes one reply at a time: a reply starts no earlier than the
+        last fragment of the previous one, so fragments of two replies never interleave.
+        """
+        due = max(time.monotonic() + (self._delay() if delay is None else delay), modem.busy_until)
+        data = text.encode('utf-8')
+        size = self.options.fragment or len(data)
+        for offset in range(0, len(data), size):
+            heapq.heappush(self._outgoing, (due, next(self._sequence), modem, data[offset:offset + size]))
+            due += 0.002  # Fragments arrive as separate reads
+        modem.busy_until = due
+
+    def _prompt(self, modem: EmulatedModem, text: str = "") -> None:
+        self._send(modem, f"{text}\r\n{PROMPT} " if modem.logged_in else f"{text}\r\n")
+
+    def _restart(self, modem: EmulatedModem, succeed: bool = True) -> None:
+        modem.restarting = True
+        modem.logged_in = False
+        modem.settings = dict(modem.saved)
+        self._send(modem, f"{RESTART_BANNER}\r\n")
+        if succeed:
+            self._send(modem, f"{RAT_BANNERS.get(modem.settings['radio_mode'], 'RAT: LTE')}\r\n"
+                              f"{MODULE_BANNERS.get(modem.settings['active_radio'], 'N27')}\r\n"
+                              f"{RESTARTED_BANNER}\r\n", self.options.restart_time)
+        heapq.heappush(self._outgoing, (time.monotonic() + self.options.restart_time, next(self._sequence),
+                                        modem, None))
+
+    def _handle(self, modem: EmulatedModem, line: str) -> None:
+        modem.commands += 1
+        if modem.restarting or random.random() < self.options.drop_rate:
+            return
+        if modem.awaiting_password:
+            modem.awaiting_password = False
+            modem.logged_in = line == self.options.password
+            self._send(modem, f"{LOGGED_IN}\r\n{PROMPT} " if modem.logged_in else "LCT: ERROR\r\n")
+            return
+        words = line.split()
+        if not words:
+            self._prompt(modem)
+        elif words == ['login']:
+            modem.awaiting_password = True
+        elif not modem.logged_in:
+            self._send(modem, "\r\n")
+        elif words[0] == 'print' and len(words) == 2 and words[1] in modem.settings:
+            self._prompt(modem, f"{words[1]}={modem.settings[words[1]]}")
+        elif words[0] == 'set' and len(words) == 3 and words[1] in modem.settings:
+            modem.settings[words[1]] = words[2]
+            self._prompt(modem, "OK")
+        elif words == ['save']:
+            modem.saved = dict(modem.settings)
+            self._prompt(modem, "OK")
+        elif words == ['reset']:
+            self._restart(modem, random.random() >= self.options.restart_fail_rate)
+        elif words[0] == 'ip.ping' and len(words) == 2:
+            if random.random() >= self.options.ping_fail_rate:
+                self._send(modem, f"recv from {words[1]}: seq=1 ttl=117 time=45ms\r\n", self.options.ping_time)
+        else:
+            self._prompt(modem, f"nieznane polecenie '{words[0]}'")
+
+    def _on_readable(self, modem: EmulatedModem) -> None:
+        try:
+            modem.buffer += os.read(modem.master, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            # Nobody has the slave open; keep listening for the next client
+            return
+        while True:
+            end = min((i for i in (modem.buffer.find(b'\n'), modem.buffer.find(b'\r')) if i >= 0), default=-1)
+            if end < 0:
+                break
+            terminator = modem.buffer[end:end + 1]
+            line, modem.buffer = modem.buffer[:end], modem.buffer[end + 1:]
+            # '\r\n' and '\n\r' end one line, not two
+            if modem.buffer[:1] in (b'\n', b'\r') and modem.buffer[:1] != terminator:
+                modem.buffer = modem.buffer[1:]
+            self._handle(modem, line.decode('utf-8', errors='replace').strip())
+
+    def _flush_due(self) -> None:
+        now = time.monotonic()
+        while self._outgoing and self._outgoing[0][0] <= now:
+            _, _, modem, data = heapq.heappop(self._outgoing)
+            if data is None:
+                modem.restarting = False
+                continue
+            try:
+                os.write(modem.master, data)
+            except OSError as e:
+                logging.debug(f"Dropping output for {modem.port}: {e}")
+
+    def _spontaneous_restarts(self, elapsed: float) -> None:
+        rate = self.options.spontaneous_restarts / 3600 * elapsed
+        if rate:
+            for modem in self.modems:
+                if not modem.restarting and random.random() < rate:
+                    self._restart(modem)
+
+    def run(self) -> None:
+        last = time.monotonic()
+        while not self._stopped:
+            timeout = max(0.0, self._outgoing[0][0] - time.monotonic()) if self._outgoing else 0.5
+            for key, _ in self.selector.select(min(timeout, 0.5)):
+                self._on_readable(key.data)
+            self._flush_due()
+            now = time.monotonic()
+            self._spontaneous_restarts(now - last)
+            last = now
+
+    def start(self) -> 'ModemEmulator':
+        """Runs the emulator on a background thread; returns self for chaining."""
+        self._thread = threading.Thread(target=self.run, name="ModemEmulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.selector.close()
+        for modem in self.modems:
+            modem.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Emulate modem consoles on pseudo-terminals.")
+    parser.add_argument('--count', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--fragment', type=int, default=0, help="largest write in bytes (0 = whole replies)")
+    parser.add_argument('--restart-time', type=float, default=3)
+    parser.add_argument('--drop-rate', type=float, default=0)
+    parser.add_argument('--ping-fail-rate', type=float, default=0)
+    parser.add_argument('--restart-fail-rate', type=float, default=0)
+    parser.add_argument('--spontaneous-restarts', type=float, default=0, help="per modem per hour")
+    parser.add_argument('--rack-config', help="write a config file with a [rack] section listing the ports")
+    args = parser.parse_args()
+
+    emulator = ModemEmulator(args.count, EmulatorOptions(
+        latency=args.latency, jitter=args.jitter, fragment=args.fragment, restart_time=args.restart_time,
+        drop_rate=args.drop_rate, ping_fail_rate=args.ping_fail_rate, restart_fail_rate=args.restart_fail_rate,
+        spontaneous_restarts=args.spontaneous_restarts))
+    for port in emulator.ports:
+        print(port)
+    if args.rack_config:
+        with open(args.rack_config, 'w') as f:
+            f.write(f"[rack]\nports = {', '.join(emulator.ports)}\nbaudrate = 115200\n"
+                    f"password = {emulator.options.password}\n")
+    try:
+        emulator.run()
+    except KeyboardInterrupt:
+        logging.info("Modem emulator stopped by user.")
+    finally:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,395 @@
+import argparse
+import codecs
+import configparser
+import heapq
+import itertools
+import logging
+import os
+import random
+import selectors
+import time
+from typing import Dict, Generator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import serial
+
+from log_writer import LogWriter
+from metrics import Gauge, MetricsRegistry, MetricsServer
+from modem_console import LOGGED_IN, PROMPT, UNKNOWN_COMMAND
+from stream_matcher import StreamMatch, StreamMatcher
+
+# Seconds between tests on every port, same cadence as run_tests
+DEFAULT_INTERVALS = {'ping': 300, 'radio': 9126, 'module': 6521}
+TEST_RESULTS = ('successful', 'failed')
+
+
+class Expect(NamedTuple):
+    """Yielded by a test to wait for one of `patterns`; the test resumes with the match or None on timeout."""
+    patterns: Union[str, Tuple[str, ...]]
+    timeout: float
+    regex: bool = False
+
+
+Test = Generator[Expect, Optional[StreamMatch], bool]
+
+
+def _matched(match: Optional[StreamMatch]) -> bool:
+    """Whether a test resumed with one of its own patterns, not a timeout or an unknown command."""
+    return match is not None and match.name == 'expected'
+
+
+def _login(port: 'ModemPort') -> Test:
+    if time.monotonic() < port.logged_in_until:
+        return True
+    port.send('\n\r')
+    port.state = 'login_probe'
+    if not _matched((yield Expect(PROMPT, 3))):
+        port.state = 'login'
+        port.send('login\n')
+        port.send(f'{port.password}\r\n')
+        if not _matched((yield Expect(LOGGED_IN, 45))):
+            return False
+    port.logged_in_until = time.monotonic() + port.login_ttl
+    return True
+
+
+def ping_test(port: 'ModemPort') -> Test:
+    if not (yield from _login(port)):
+        return False
+    port.state = 'ping'
+    port.send('ip.ping 8.8.8.8\n')
+    return _matched((yield Expect("recv from 8.8.8.8:", 30)))
+
+
+def _change_test(port: 'ModemPort', setting: str, commands: Dict[str, str], results: Tuple[str, ...]) -> Test:
+    """Flips a setting, saves it, resets the modem and waits for the new mode; up to 2 retries."""
+    for _ in range(3):
+        if not (yield from _login(port)):
+            continue
+        port.state = f'query_{setting}'
+        port.send(f'print {setting}\n')
+        match = yield Expect(rf"{setting}=(\S+)\s", 30, regex=True)
+        command = commands.get(match.groups[0] if _matched(match) else "")
+        if command:
+            port.state = f'set_{setting}'
+            port.send(f'{command}\n')
+            yield Expect(PROMPT, 3)
+        port.state = 'save'
+        port.send('save\n')
+        yield Expect(PROMPT, 5)
+        port.state = 'reset'
+        port.expected_restarts += 1
+        pending = port.expected_restarts
+        port.logged_in_until = 0.0
+        port.send('reset\n')
+        matched = _matched((yield Expect(results, 40)))
+        if port.expected_restarts == pending:
+            # No restart banner came with this reset, so the next restart is not ours
+            port.expected_restarts -= 1
+        if matched:
+            return True
+    return False
+
+
+def radio_test(port: 'ModemPort') -> Test:
+    return (yield from _change_test(port, 'radio_mode', {'lte': 'set radio_mode 2g', '2g': 'set radio_mode lte',
+                                                         'auto': 'set radio_mode lte'}, ("RAT: LTE", "RAT: EDGE")))
+
+
+def module_test(port: 'ModemPort') -> Test:
+    return (yield from _change_test(port, 'active_radio', {'1': 'set active_radio 2', '2': 'set active_radio 1'},
+                                    ("N27", "N717")))
+
+
+TESTS = {'ping': ping_test, 'radio': radio_test, 'module': module_test}
+
+
+class ModemPort:
+    """State of one modem: its serial port, the running test and the pattern it is waiting for."""
+
+    def __init__(self, device: str, baudrate: int, password: str, login_ttl: float = 600) -> None:
+        self.device = device
+        self.baudrate = baudrate
+        self.password = password
+        self.login_ttl = login_ttl
+        self.ser: Optional[serial.Serial] = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.partial_line = ""
+        self.state = 'idle'
+        self.test: Optional[Test] = None
+        self.test_name: Optional[str] = None
+        self.matcher: Optional[StreamMatcher] = None
+        self.expect_token = 0  # Identifies the current wait, so stale timeouts are ignored
+        self.logged_in_until = 0.0
+        self.is_up = True
+        self.expected_restarts = 0  # Resets sent by a test that should not count as modem restarts
+        self.watch = StreamMatcher()
+        self.watch.register('restart', " Restart w ciagu 3 s")
+        self.watch.register('restarted', "Modul radiowy poprawnie wykryty i zainicjowany")
+
+    def open(self) -> bool:
+        try:
+            self.ser = serial.Serial(self.device, baudrate=self.baudrate, timeout=0)
+            logging.info(f"Connected to {self.device}")
+            return True
+        except serial.SerialException as e:
+            logging.error(f"Failed to connect to {self.device}: {e}")
+            self.ser = None
+            return False
+
+    def close(self) -> None:
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except serial.SerialException:
+                pass
+            self.ser = None
+        self.decoder.reset()
+        self.partial_line = ""
+
+    def send(self, text: str) -> None:
+        self.ser.write(text.encode())
+
+    def read(self) -> str:
+        """Reads whatever is buffered without blocking."""
+        return self.decoder.decode(self.ser.read(self.ser.in_waiting or 1))
+
+    def lines(self, text: str) -> List[str]:
+        """Complete lines received so far; an unfinished line is kept for the next chunk."""
+        lines = (self.partial_line + text).split('\n')
+        self.partial_line = lines.pop()
+        return lines
+
+
+class ModemRack:
+    """Drives the restart, ping, radio and module tests on many modems from one thread.
+
+    Every port is registered with a selector; a single loop reads whichever ports are ready, feeds
+    their data to the port's matchers and resumes the port's test, and fires timers (test deadlines
+    and reply timeouts) from a heap. Each port runs one test at a time and tests are written as
+    generators, so a port's position in its test is its state. Apart from this loop, only the log
+    writer and the optional metrics server use threads, however many modems there are.
+    """
+
+    def __init__(self, devices: Sequence[str], baudrate: int, password: str, log_dir: str = 'logs',
+                 intervals: Optional[Dict[str, float]] = None, jitter: float = 60, login_ttl: float = 600,
+                 reconnect_delay: float = 5, metrics_port: int = 0) -> None:
+        self.ports = [ModemPort(device, baudrate, password, login_ttl) for device in devices]
+        self.intervals = intervals or DEFAULT_INTERVALS
+        self.jitter = jitter
+        self.reconnect_delay = reconnect_delay
+        self.selector = selectors.DefaultSelector()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._stopped = False
+
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_writer = LogWriter(os.path.join(log_dir, 'serial_log_rack.txt'))
+        self.log_writer.start()
+
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        if metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, port=metrics_port)
+                self.metrics_server.start()
+            except OSError as e:
+                logging.error(f"Could not serve metrics on port {metrics_port}: {e}")
+                self.metrics_server = None
+
+    def _count(self, port: ModemPort, test: str, result: str) -> None:
+        self.metrics.counter('modem_tests_total', "Finished tests by result",
+                             {'port': port.device, 'test': test, 'result': result}).inc()
+
+    def _set_up(self, port: ModemPort, up: bool) -> None:
+        port.is_up = up
+        self.metrics.gauge('modem_up', "1 while the modem is up, 0 during a restart", {'port': port.device}).set(int(up))
+
+    def results(self, port: ModemPort) -> Dict[str, Dict[str, int]]:
+        return {test: {result: int(self.metrics.counter('modem_tests_total', "Finished tests by result",
+                                                        {'port': port.device, 'test': test, 'result': result}).value)
+                       for result in TEST_RESULTS}
+                for test in TESTS}
+
+    def restarts(self, port: ModemPort) -> int:
+        return int(self._restarts_gauge(port).value)
+
+    def _restarts_gauge(self, port: ModemPort) -> Gauge:
+        # Same metric as SerialCommunicator's, so dashboards can combine both drivers
+        return self.metrics.gauge('modem_restarts', "Modem restarts not caused by a test", {'port': port.device})
+
+    def _schedule(self, delay: float, kind: str, port: ModemPort, data=None) -> None:
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._sequence), kind, port, data))
+
+    def _connect(self, port: ModemPort) -> None:
+        if port.open():
+            self.selector.register(port.ser.fileno(), selectors.EVENT_READ, port)
+        else:
+            self._schedule(self.reconnect_delay, 'reconnect', port)
+
+    def _disconnect(self, port: ModemPort, error: Exception) -> None:
+        logging.error(f"Disconnected from {port.device}: {error}")
+        if port.ser is not None:
+            self.selector.unregister(port.ser.fileno())
+        port.close()
+        if port.test is not None:
+            self._finish(port, False)
+        self._schedule(self.reconnect_delay, 'reconnect', port)
+
+    def _on_readable(self, port: ModemPort) -> None:
+        try:
+            text = port.read()
+        except (serial.SerialException, OSError) as e:
+            self._disconnect(port, e)
+            return
+        if not text:
+            return
+        timestamp = time.time()
+        for line in port.lines(text):
+            line = line.strip()
+            if line and not line.startswith(PROMPT):
+                self.log_writer.write(f"{port.device}: {line}", timestamp)
+        for match in port.watch.feed(text):
+            self._on_watch(port, match)
+        if port.matcher is not None:
+            for match in port.matcher.feed(text):
+                if match.name == 'unknown_command':
+                    logging.warning(f"{port.device}: unknown command '{match.groups[0]}'")
+                self._resume(port, match)
+                break
+
+    def _on_watch(self, port: ModemPort, match: StreamMatch) -> None:
+        if match.name == 'restart':
+            port.logged_in_until = 0.0
+            self._set_up(port, False)
+            if port.expected_restarts:
+                port.expected_restarts -= 1
+            else:
+                self._restarts_gauge(port).inc()
+                logging.info(f"{port.device}: modem restarts: {self.restarts(port)}")
+        else:
+            self._set_up(port, True)
+
+    def _start_test(self, port: ModemPort, name: str) -> None:
+        if port.ser is None or port.test is not None:
+            # The port is busy or offline; tests on one modem never overlap
+            self._schedule(5, 'test', port, name)
+            return
+        logging.info(f"{port.device}: starting {name} test")
+        port.test = TESTS[name](port)
+        port.test_name = name
+        self._resume(port, None)
+
+    def _resume(self, port: ModemPort, value: Optional[StreamMatch]) -> None:
+        port.matcher = None
+        port.expect_token += 1
+        try:
+            expect = port.test.send(value)
+        except StopIteration as done:
+            self._finish(port, bool(done.value))
+            return
+        except (serial.SerialException, OSError) as e:
+            self._disconnect(port, e)
+            return
+        matcher = StreamMatcher()
+        matcher.register('unknown_command', UNKNOWN_COMMAND, regex=True, max_length=128)
+        patterns = (expect.patterns,) if isinstance(expect.patterns, str) else expect.patterns
+        for pattern in patterns:
+            matcher.register('expected', pattern, regex=expect.regex)
+        port.matcher = matcher
+        self._schedule(expect.timeout, 'timeout', port, port.expect_token)
+
+    def _finish(self, port: ModemPort, success: bool) -> None:
+        name = port.test_name
+        logging.info(f"{port.device}: {name} test {'successful' if success else 'failed'}")
+        self._count(port, name, 'successful' if success else 'failed')
+        if port.test is not None:
+            port.test.close()
+        port.test = None
+        port.test_name = None
+        port.matcher = None
+        port.state = 'idle'
+        self._schedule(self.intervals[name] + random.uniform(0, self.jitter), 'test', port, name)
+
+    def _fire(self, kind: str, port: ModemPort, data) -> None:
+        if kind == 'test':
+            self._start_test(port, data)
+        elif kind == 'timeout':
+            if port.test is not None and data == port.expect_token:
+                self._resume(port, None)
+        elif kind == 'reconnect':
+            self._connect(port)
+
+    def report(self) -> List[str]:
+        lines = []
+        for port in self.ports:
+            results = self.results(port)
+            summary = " ".join(f"{test}={counts['successful']}/{counts['successful'] + counts['failed']}"
+                               for test, counts in results.items())
+            lines.append(f"Rack {port.device}: {summary} restarts={self.restarts(port)} "
+                         f"state={port.state} up={port.is_up}")
+        return lines
+
+    def run(self) -> None:
+        """Runs the event loop until stop() is called."""
+        for port in self.ports:
+            self._set_up(port, True)
+            self._connect(port)
+            # Spread the first runs over the interval so the modems do not all reset together
+            for name, interval in self.intervals.items():
+                self._schedule(random.uniform(0, interval), 'test', port, name)
+        while not self._stopped:
+            timeout = max(0.0, self._timers[0][0] - time.monotonic()) if self._timers else 1.0
+            for key, _ in self.selector.select(min(timeout, 1.0)):
+                self._on_readable(key.data)
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, kind, port, data = heapq.heappop(self._timers)
+                self._fire(kind, port, data)
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def close(self) -> None:
+        for port in self.ports:
+            if port.ser is not None:
+                self.selector.unregister(port.ser.fileno())
+            port.close()
+        self.selector.close()
+        self.log_writer.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the modem tests on a rack of modems from one process.")
+    parser.add_argument('--config', default='config_file.txt')
+    parser.add_argument('--ports', nargs='*', help="serial ports; defaults to 'ports' in the [rack] section")
+    parser.add_argument('--log-dir', default='logs')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    section = config['rack'] if config.has_section('rack') else config['DEFAULT']
+    devices = args.ports or [port.strip() for port in section.get('ports', fallback='').split(',') if port.strip()]
+    if not devices:
+        parser.error("no serial ports given")
+
+    rack = ModemRack(devices, section.getint('baudrate', fallback=115200), section.get('password', fallback=''),
+                     args.log_dir, jitter=section.getfloat('jitter', fallback=60),
+                     login_ttl=section.getfloat('login_ttl', fallback=600),
+                     metrics_port=section.getint('metrics_port', fallback=0))
+    logging.info(f"Driving {len(devices)} modems")
+    try:
+        rack.run()
+    except KeyboardInterrupt:
+        logging.info("Rack testing interrupted by user.")
+    finally:
+        for line in rack.report():
+            logging.info(line)
+        rack.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename='rack_log.txt', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -7,6 +7,15 @@ import binascii
 import time
 from datetime import datetime
 import configparser
+import glob
+
+from checkpoint import FSYNC_INTERVAL, Checkpointer
+from dlms import KEEPALIVE_HEX, FrameReader, MeterSession, SessionError, apdu_name
+from latency import LatencyTracker
+from log_index import IndexWriter, index_path
+from log_rotation import compress_later, free_segment_name
+from meter_health import HealthTracker
+from results_store import ReadRecord, ResultsStore
 
 # Inicjalizuj liczniki udanych i nieudanych odczytów
 successful_reads = 0
@@ -14,6 +23,16 @@ error_reads = 0
 timeout_reads = 0
 partial_reads = 0
 no_response = 0
+# Cykle pominięte przez otwarty wyłącznik: nie są odczytami, więc nie wchodzą do skuteczności
+skipped_reads = 0
+# Czas przestoju w sekundach: przerwy między ostatnim punktem kontrolnym a wznowieniem programu
+downtime_seconds = 0.0
+
+# Histogramy czasów: połączenie TCP, RTT każdego APDU i cały cykl, osobno dla każdego licznika
+latency = LatencyTracker()
+
+# Wynik ostatniego cyklu jako jeden wiersz do bazy wyników
+last_cycle = None
 
 # Sprawdzenie, czy plik istnieje
 config_file = 'odczyt_licznika.ini'
@@ -28,7 +47,9 @@ if not os.path.exists(config_file):
     'log_dir': './',
     'socket_timeout': '5',
     'num_retries': '15000',
-    'delay_between_runs': '5'
+    'delay_between_runs': '5',
+    'persistent_session': 'false',
+    'enable_readout': 'false'
     }
 
   # Zapisanie domyślnych wartości do nowego pliku konfiguracyjnego
@@ -40,14 +61,61 @@ else:
   config = configparser.ConfigParser()
   config.read(config_file)
 
+# Kategorie wyniku pojedynczego cyklu odczytu
+OUTCOME_SUCCESSFUL = 'successful'
+OUTCOME_PARTIAL = 'partial'
+OUTCOME_NO_RESPONSE = 'no_response'
+OUTCOME_ERROR = 'error'
+OUTCOME_TIMEOUT = 'timeout'
+
+def classify_read(reads_count, expected_reads):
+  # Odczyt udany, gdy licznik odpowiedział na każdą ramkę, częściowy gdy tylko na niektóre
+  if reads_count == expected_reads:
+    return OUTCOME_SUCCESSFUL
+  elif reads_count > 0:
+    return OUTCOME_PARTIAL
+  return OUTCOME_NO_RESPONSE
+
+def record_read(reads_count, error_flag, expected_reads):
+  global successful_reads, partial_reads, no_response
+
+  # Błędy połączenia są liczone osobno przy obsłudze wyjątku
+  if error_flag == 0:
+    outcome = classify_read(reads_count, expected_reads)
+    if outcome == OUTCOME_SUCCESSFUL:
+      successful_reads += 1
+    elif outcome == OUTCOME_PARTIAL:
+      partial_reads += 1
+    else:
+      no_response += 1
+    return outcome
+  return None
+
+def checkpoint_state(counter):
+  # Stan kampanii zapisywany w punkcie kontrolnym
+  return {'counter': counter, 'successful_reads': successful_reads, 'partial_reads': partial_reads,
+          'no_response': no_response, 'error_reads': error_reads, 'timeout_reads': timeout_reads,
+          'skipped_reads': skipped_reads, 'downtime_seconds': downtime_seconds}
+
 def send_and_receive_hex_data_tcp(hex_data_list, ip_address, port):
-  global successful_reads, partial_reads, no_response, error_reads, timeout_reads, socket_timeout # Informacja, że używamy zmiennych globalnych
+  global successful_reads, partial_reads, no_response, error_reads, timeout_reads, last_cycle # Informacja, że używamy zmiennych globalnych
 
   # Utwórz gniazdo TCP
   sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  meter_name = str(ip_address)+':'+str(port)
 
-  # Ustaw timeout dla operacji na gnieździe (w sekundach)
-  sock.settimeout(socket_timeout)  # Przykładowy timeout: 5 sekund
+  # Ustaw timeout dla operacji na gnieździe (w sekundach): adaptacyjny z RTT licznika, najwyżej socket_timeout
+  sock.settimeout(health.timeout(meter_name))
+
+  # Pomiar czasów zegarem monotonicznym
+  cycle_timestamp = time.time()
+  cycle_start = time.perf_counter()
+  connect_time = None
+  rtt_total = 0.0
+  bytes_sent = 0
+  bytes_received = 0
+  outcome = None
+  error_text = None
 
   try:
     # Wyzeruj licznik odczytów w pętli oraz flagę błędów
@@ -56,17 +124,23 @@ def send_and_receive_hex_data_tcp(hex_data_list, ip_address, port):
 
     # Połącz się z określonym adresem IP i portem
     sock.connect((ip_address, port))
+    connect_time = time.perf_counter() - cycle_start
+    latency.record(meter_name, 'connect', connect_time)
+    frame_reader = FrameReader(sock)
 
     for hex_data in hex_data_list:
       # Przekonwertuj dane szesnastkowe na bajty
       binary_data = binascii.unhexlify(hex_data)
 
       # Wyślij dane
+      request_start = time.perf_counter()
       sock.sendall(binary_data)
+      bytes_sent += len(binary_data)
 
       try:
-        # Odbierz odpowiedź (maksymalny rozmiar bufora to 2048 bajtów)
-        received_data = sock.recv(2048)
+        # Odbierz dokładnie jedną ramkę DLMS (długość APDU z nagłówka wrappera)
+        frame = frame_reader.read_frame()
+        received_data = frame.raw if frame else b''
 
         if received_data:
 	  # Przekonwertuj otrzymane dane na format szesnastkowy
@@ -74,44 +148,123 @@ def send_and_receive_hex_data_tcp(hex_data_list, ip_address, port):
 
           print("Received data:", str(hex_received_data))
           plik.write('Received data: '+str(hex_received_data)+'\n')
+          rtt = time.perf_counter() - request_start
+          latency.record(meter_name, apdu_name(binary_data), rtt)
+          health.observe(meter_name, rtt)
+          rtt_total += rtt
+          bytes_received += len(received_data)
 
           # Zwiększ licznik udanych odczytów
           reads_count += 1
 
       except socket.timeout:
+        health.timed_out(meter_name)
         print("Received data: Meter did not respond.")
         plik.write('Received data: Meter did not respond.'+'\n')
+        # Spóźniona (lub niepełna) odpowiedź zostałaby wzięta za odpowiedź na następną ramkę, więc kończymy z tym połączeniem
+        break
 
   except socket.timeout:
+    health.timed_out(meter_name)
     timeout_reads += 1
     error_flag += 1
+    outcome = OUTCOME_TIMEOUT
+    error_text = 'TCP connection timeout.'
     print("Error: TCP connection timeout.")
     plik.write('Error: TCP connection timeout.'+'\n')
 
-  except socket.error as e:
+  except (socket.error, SessionError) as e:
     error_reads += 1
     error_flag += 1
+    outcome = OUTCOME_ERROR
+    error_text = str(e)
     print("Error: ",str(e))
     plik.write('Error: '+str(e)+'\n')
 
   finally:
     # Zamknij gniazdo
     sock.close()
+    cycle_time = time.perf_counter() - cycle_start
+    latency.record(meter_name, 'cycle', cycle_time)
 
-    # Statystyka liczby odczytów
-    # if reads_count == 3 and error_flag == 0: 
-    if reads_count == 2 and error_flag == 0: # Zmiana po wyłączeniu "Readout"
-      successful_reads += 1
-    # elif reads_count in [1,2] and error_flag == 0:
-    elif reads_count in [1] and error_flag == 0: # Zmiana po wyłączeniu "Readout"
-      partial_reads += 1
-    else:
-      if reads_count == 0 and error_flag == 0:
-        no_response += 1
+    # Statystyka liczby odczytów; nieudane cykle z rzędu otwierają wyłącznik licznika
+    outcome = record_read(reads_count, error_flag, len(hex_data_list)) or outcome
+    health.record(meter_name, outcome in (OUTCOME_SUCCESSFUL, OUTCOME_PARTIAL))
+    last_cycle = ReadRecord(cycle_timestamp, meter_name, outcome, reads_count, len(hex_data_list), bytes_sent,
+                            bytes_received, connect_time * 1000 if connect_time is not None else None,
+                            rtt_total * 1000, cycle_time * 1000, error_text)
 
   # Zwróć liczbę udanych i błędnych odczytów
   return successful_reads, partial_reads, no_response, error_reads, timeout_reads
 
+def send_and_receive_hex_data_session(session):
+  global error_reads, timeout_reads, last_cycle
+
+  # Wyzeruj licznik odczytów w pętli oraz flagę błędów
+  reads_count = 0
+  error_flag = 0
+  meter_name = str(session.ip_address)+':'+str(session.port)
+  cycle_timestamp = time.time()
+  cycle_start = time.perf_counter()
+  bytes_received = 0
+  outcome = None
+  error_text = None
+
+  # Adaptacyjny timeout licznika: dla następnego open() i dla już otwartego gniazda
+  session.timeout = health.timeout(meter_name)
+  if session.sock:
+    session.sock.settimeout(session.timeout)
+
+  try:
+    # Wyślij zapytania w ramach otwartej asocjacji (połączenie i AARQ tylko gdy sesja została zerwana)
+    odpowiedzi = session.cycle()
+    for received_data, rtt, request in zip(odpowiedzi, session.rtts, session.request_frames):
+      if received_data:
+        hex_received_data = binascii.hexlify(received_data).decode('utf-8')
+        print("Received data:", str(hex_received_data))
+        plik.write('Received data: '+str(hex_received_data)+'\n')
+        # Czas odpowiedzi każdego zapytania zasila histogram i estymator RTT licznika
+        latency.record(meter_name, apdu_name(request), rtt)
+        health.observe(meter_name, rtt)
+        reads_count += 1
+        bytes_received += len(received_data)
+      else:
+        print("Received data: Meter did not respond.")
+        plik.write('Received data: Meter did not respond.'+'\n')
+    if None in odpowiedzi:
+      # Po pierwszym braku odpowiedzi sesja przerywa cykl, więc to jeden timeout
+      health.timed_out(meter_name)
+
+  except socket.timeout:
+    health.timed_out(meter_name)
+    timeout_reads += 1
+    error_flag += 1
+    outcome = OUTCOME_TIMEOUT
+    error_text = 'TCP connection timeout.'
+    print("Error: TCP connection timeout.")
+    plik.write('Error: TCP connection timeout.'+'\n')
+
+  except (socket.error, SessionError) as e:
+    error_reads += 1
+    error_flag += 1
+    outcome = OUTCOME_ERROR
+    error_text = str(e)
+    print("Error: ",str(e))
+    plik.write('Error: '+str(e)+'\n')
+
+  # Statystyka liczby odczytów oraz długości życia sesji
+  cycle_time = time.perf_counter() - cycle_start
+  latency.record(meter_name, 'cycle', cycle_time)
+  outcome = record_read(reads_count, error_flag, len(session.request_frames)) or outcome
+  health.record(meter_name, outcome in (OUTCOME_SUCCESSFUL, OUTCOME_PARTIAL))
+  last_cycle = ReadRecord(cycle_timestamp, meter_name, outcome, reads_count, len(session.request_frames),
+                          sum(len(frame) for frame in session.request_frames), bytes_received, None,
+                          None, cycle_time * 1000, error_text)
+  print("Session cycles:", str(session.current_session_cycles), "reconnects:", str(session.reconnects))
+  plik.write('Session cycles: '+str(session.current_session_cycles)+' reconnects: '+str(session.reconnects)+'\n')
+
+  return successful_reads, partial_reads, no_response, error_reads, timeout_reads
+
 # Lista danych do wysłania w formacie szesnastkowym
 data_to_send_hex_list = [
   "000100010001003F603DA109060760857405080101A90504034447548A0207808B0760857405080201AC0A80083031323334353637BE10040E01000000065F1F040000FFFFFFFF",  # Connect
@@ -119,6 +272,11 @@ data_to_send_hex_list = [
   "00010001000100056203800100",  # Disconnect
 ]
 
+# Readout (domyślnie wyłączony); ramki są czytane według długości z nagłówka, więc większe odpowiedzi nie są obcinane
+readout_hex = "0001000100010040C003C1060007000015000BFF03000007000015000BFF04000007000015000BFF05000007000015000BFF06000007000015000BFF07000007000015000BFF0800"
+if config['CONFIG'].getboolean('enable_readout', fallback=False):
+  data_to_send_hex_list.insert(1, readout_hex)
+
 # TCP socket timeout
 socket_timeout = config['CONFIG'].getint('socket_timeout')
 
@@ -133,48 +291,195 @@ port = config['CONFIG'].getint('port')
 num_retries = config['CONFIG'].getint('num_retries')
 delay_between_runs = config['CONFIG'].getint('delay_between_runs')  # Opóźnienie: 5 sekund
 
-# Wyświetlenie wartości zmiennych konfiguracyjnych
-print("##############################")
-print("CONFIG section:")
-print("ip_address: ", str(ip_address))
-print("port: ", str(port))
-print("log_dir: ", str(log_dir))
-print("socket_timeout: ", str(socket_timeout))
-print("num_retries: ", str(num_retries))
-print("delay_between_runs: ", str(delay_between_runs))
-print("##############################")
-
-# Pętla wykonująca funkcję z określoną liczbą powtórzeń i opóźnieniem oraz zapisująca zdarzenia do pliku
-for counter in range(1,num_retries+1):
-  current_timestamp = time.time()
-  formatted_timestamp = datetime.fromtimestamp(current_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-  file_name = str(log_dir)+datetime.fromtimestamp(current_timestamp).strftime('%Y-%m-%d_odczyt_licznika'+'.txt')
-  plik = open(file_name, 'a')
-  print("Timestamp:", str(formatted_timestamp))
-  plik.write('Timestamp: '+str(formatted_timestamp)+'\n')
-  successful_reads, partial_reads, no_response, error_reads, timeout_reads = send_and_receive_hex_data_tcp(data_to_send_hex_list, ip_address, port)
-  print("Loop counter: ", str(counter),"/",str(num_retries))
-  plik.write('Loop counter: '+str(counter)+'/'+str(num_retries)+'\n')
-
-  if counter != 0:
-    percent = (float(successful_reads) / counter) * 100
+# Tryb sesji trwałej: połączenie TCP i asocjacja DLMS pozostają otwarte między cyklami
+persistent_session = config['CONFIG'].getboolean('persistent_session', fallback=False)
+keepalive_hex = config['CONFIG'].get('keepalive_hex', fallback=KEEPALIVE_HEX)
+
+# Co ile cykli zapisywać percentyle czasów do dziennego logu
+latency_report_every = config['CONFIG'].getint('latency_report_every', fallback=60)
+
+# Baza wyników (SQLite, pusty wpis wyłącza) i opcjonalny tekstowy log dzienny
+results_db = config['CONFIG'].get('results_db', fallback=str(log_dir)+'odczyt_licznika.db')
+text_log = config['CONFIG'].getboolean('text_log', fallback=True)
+
+# Co który cykl zapisywać pozycję w pliku do indeksu czasu (<plik>.idx, zob. log_index.py); 0 wyłącza indeks
+index_every = config['CONFIG'].getint('index_every', fallback=16)
+
+# Rotacja logu dziennego: maksymalny rozmiar w MB (0 = tylko dzienna) i kompresja gzip zamkniętych plików w tle
+log_max_bytes = int(config['CONFIG'].getfloat('log_max_mb', fallback=10) * 1024 * 1024)
+log_compress = config['CONFIG'].getboolean('log_compress', fallback=True)
+
+# Punkt kontrolny statystyk (zapis atomowy co checkpoint_every cykli, pusty wpis wyłącza); po awarii pętla wznawia od zapisanego cyklu
+checkpoint_file = config['CONFIG'].get('checkpoint_file', fallback=str(log_dir)+'odczyt_licznika_checkpoint.json')
+checkpoint_every = config['CONFIG'].getint('checkpoint_every', fallback=12)
+checkpoint_fsync = config['CONFIG'].get('checkpoint_fsync', fallback=FSYNC_INTERVAL)
+
+# Adaptacyjny timeout (SRTT + 4*RTTVAR z czasów odpowiedzi, od min_timeout do socket_timeout) i wyłącznik:
+# po breaker_failures nieudanych cyklach z rzędu licznik jest pomijany przez breaker_backoff s, potem 2x dłużej itd.
+adaptive_timeout = config['CONFIG'].getboolean('adaptive_timeout', fallback=True)
+min_timeout = config['CONFIG'].getfloat('min_timeout', fallback=1.0)
+breaker_failures = config['CONFIG'].getint('breaker_failures', fallback=3)
+breaker_backoff = config['CONFIG'].getfloat('breaker_backoff', fallback=30)
+breaker_backoff_max = config['CONFIG'].getfloat('breaker_backoff_max', fallback=3600)
+health = HealthTracker(socket_timeout, min_timeout, adaptive_timeout, breaker_failures, breaker_backoff,
+                       breaker_backoff_max)
+
+if __name__ == '__main__':
+  # Wyświetlenie wartości zmiennych konfiguracyjnych
+  print("##############################")
+  print("CONFIG section:")
+  print("ip_address: ", str(ip_address))
+  print("port: ", str(port))
+  print("log_dir: ", str(log_dir))
+  print("socket_timeout: ", str(socket_timeout))
+  print("num_retries: ", str(num_retries))
+  print("delay_between_runs: ", str(delay_between_runs))
+  print("persistent_session: ", str(persistent_session))
+  print("enable_readout: ", str(readout_hex in data_to_send_hex_list))
+  print("results_db: ", str(results_db))
+  print("text_log: ", str(text_log))
+  print("index_every: ", str(index_every))
+  print("log_max_mb: ", str(log_max_bytes / 1024 / 1024))
+  print("log_compress: ", str(log_compress))
+  print("checkpoint_file: ", str(checkpoint_file))
+  print("adaptive_timeout: ", str(adaptive_timeout))
+  print("breaker_failures: ", str(breaker_failures))
+  print("##############################")
+
+  session = None
+  if persistent_session:
+    # Zapytania wysyłane w każdym cyklu to ramki pomiędzy Connect i Disconnect lub keep-alive
+    session = MeterSession(ip_address, port, socket_timeout, data_to_send_hex_list[0], data_to_send_hex_list[-1],
+                           data_to_send_hex_list[1:-1] or [keepalive_hex])
+
+  results_store = ResultsStore(results_db) if results_db else None
+  indeks = None
+  poprzedni_plik = None
+
+  # Wznowienie statystyk z punktu kontrolnego; przerwa (bez oczekiwanego opóźnienia) liczy się jako przestój
+  checkpointer = Checkpointer(checkpoint_file, checkpoint_fsync) if checkpoint_file else None
+  first_counter = 1
+  stan = checkpointer.load() if checkpointer else None
+  if stan:
+    successful_reads = stan['successful_reads']
+    partial_reads = stan['partial_reads']
+    no_response = stan['no_response']
+    error_reads = stan['error_reads']
+    timeout_reads = stan['timeout_reads']
+    skipped_reads = stan.get('skipped_reads', 0)
+    downtime_seconds = stan['downtime_seconds'] + max(0.0, time.time() - stan['saved_at'] - delay_between_runs)
+    first_counter = stan['counter'] + 1
+    print("Resumed from checkpoint at loop counter:", str(stan['counter']), "downtime: {:.0f} s".format(downtime_seconds))
+
+  # Pliki z poprzednich dni (np. po awarii) też trafiają do kompresji
+  if text_log and log_compress:
+    dzisiejszy = str(log_dir)+datetime.now().strftime('%Y-%m-%d_odczyt_licznika'+'.txt')
+    for stary in glob.glob(glob.escape(str(log_dir))+'*_odczyt_licznika*.txt'):
+      if os.path.abspath(stary) != os.path.abspath(dzisiejszy):
+        compress_later(stary)
+
+  # Pętla wykonująca funkcję z określoną liczbą powtórzeń i opóźnieniem oraz zapisująca zdarzenia do pliku
+  for counter in range(first_counter,num_retries+1):
+    current_timestamp = time.time()
+    formatted_timestamp = datetime.fromtimestamp(current_timestamp).strftime('%Y-%m-%d %H:%M:%S')
+    file_name = str(log_dir)+datetime.fromtimestamp(current_timestamp).strftime('%Y-%m-%d_odczyt_licznika'+'.txt')
+    if text_log:
+      przekroczony = log_max_bytes and os.path.exists(file_name) and os.path.getsize(file_name) >= log_max_bytes
+      if indeks and (indeks.log_path != file_name or przekroczony):
+        indeks.close()
+        indeks = None
+      if przekroczony:
+        # Plik osiągnął maksymalny rozmiar: przeniesienie do kolejnego segmentu <nazwa>.<n>.txt
+        segment = free_segment_name(file_name)
+        os.replace(file_name, segment)
+        if os.path.exists(index_path(file_name)):
+          os.replace(index_path(file_name), index_path(segment))
+        if log_compress:
+          compress_later(segment)
+      if log_compress and poprzedni_plik and poprzedni_plik != file_name:
+        # Nowy dzień: plik z poprzedniego dnia jest już zamknięty
+        compress_later(poprzedni_plik)
+      poprzedni_plik = file_name
+    plik = open(file_name, 'a') if text_log else open(os.devnull, 'w')
+    if text_log and index_every:
+      # Nowy plik (dzienny lub kolejny segment) dostaje własny indeks
+      if indeks is None:
+        indeks = IndexWriter(file_name, index_every)
+      indeks.add(current_timestamp, os.path.getsize(file_name))
+    print("Timestamp:", str(formatted_timestamp))
+    plik.write('Timestamp: '+str(formatted_timestamp)+'\n')
+    meter_name = str(ip_address)+':'+str(port)
+    if not health.allow(meter_name):
+      # Wyłącznik otwarty: licznik nie odpowiadał w kolejnych cyklach, więc cykl jest pomijany bez czekania na timeout
+      skipped_reads += 1
+      print("Meter skipped: circuit breaker open, retry in {:.0f} s".format(health.retry_in(meter_name)))
+      plik.write('Meter skipped: circuit breaker open, retry in {:.0f} s\n'.format(health.retry_in(meter_name)))
+    else:
+      if session:
+        successful_reads, partial_reads, no_response, error_reads, timeout_reads = send_and_receive_hex_data_session(session)
+      else:
+        successful_reads, partial_reads, no_response, error_reads, timeout_reads = send_and_receive_hex_data_tcp(data_to_send_hex_list, ip_address, port)
+      if results_store:
+        results_store.add(last_cycle)
+    print("Loop counter: ", str(counter),"/",str(num_retries))
+    plik.write('Loop counter: '+str(counter)+'/'+str(num_retries)+'\n')
+
+    # Skuteczność liczona z cykli, w których licznik był odpytany (tak samo jak w meter_poller)
+    polled_reads = successful_reads + partial_reads + no_response + error_reads + timeout_reads
+    if polled_reads != 0:
+      percent = (float(successful_reads) / polled_reads) * 100
+    else:
+      percent = 0.0
     print("Meter reading accuracy: {:.2f}%".format(percent))
     plik.write('Meter reading accuracy: {:.2f}%\n'.format(percent))
-  else:
-    print("Error: The variable [counter] must have a non-zero value.")
-    plik.write('Error: The variable [counter] must have a non-zero value.')
-
-  print("Successful meter readings:", str(successful_reads))
-  plik.write('Successful meter readings: '+str(successful_reads)+'\n')
-  print("Incomplete meter readings:", str(partial_reads))
-  plik.write('Incomplete meter readings: '+str(partial_reads)+'\n')
-  print("Meter not responding:", str(no_response))
-  plik.write('Meter not responding: '+str(no_response)+'\n')
-  print("TCP connection error:", str(error_reads))
-  plik.write('TCP connection error: '+str(error_reads)+'\n')
-  print("TCP timeout error:", str(timeout_reads))
-  plik.write('TCP timeout error: '+str(timeout_reads)+'\n')
-  print("---------------------------------------------")
-  plik.write('---------------------------------------------'+'\n')
-  plik.close()
-  time.sleep(delay_between_runs)
+
+    print("Successful meter readings:", str(successful_reads))
+    plik.write('Successful meter readings: '+str(successful_reads)+'\n')
+    print("Incomplete meter readings:", str(partial_reads))
+    plik.write('Incomplete meter readings: '+str(partial_reads)+'\n')
+    print("Meter not responding:", str(no_response))
+    plik.write('Meter not responding: '+str(no_response)+'\n')
+    print("TCP connection error:", str(error_reads))
+    plik.write('TCP connection error: '+str(error_reads)+'\n')
+    print("TCP timeout error:", str(timeout_reads))
+    plik.write('TCP timeout error: '+str(timeout_reads)+'\n')
+    print("Meters skipped (circuit breaker open):", str(skipped_reads))
+    plik.write('Meters skipped (circuit breaker open): '+str(skipped_reads)+'\n')
+    if downtime_seconds:
+      print("Downtime: {:.0f} s".format(downtime_seconds))
+      plik.write('Downtime: {:.0f} s\n'.format(downtime_seconds))
+    if latency_report_every and counter % latency_report_every == 0:
+      for line in latency.report() + health.report():
+        print(line)
+        plik.write(line+'\n')
+      # Każdy raport obejmuje tylko cykle od poprzedniego, żeby było widać bieżące pogorszenie
+      latency.new_window()
+    print("---------------------------------------------")
+    plik.write('---------------------------------------------'+'\n')
+    plik.close()
+    if indeks:
+      indeks.flush()
+    if checkpointer and checkpoint_every and counter % checkpoint_every == 0:
+      checkpointer.save(checkpoint_state(counter))
+    time.sleep(delay_between_runs)
+
+  if indeks:
+    indeks.close()
+
+  if latency_report_every:
+    print("Latency over the whole campaign:")
+    for line in latency.report(campaign=True):
+      print(line)
+
+  # Kampania zakończona: następne uruchomienie zaczyna od zera
+  if checkpointer:
+    checkpointer.remove()
+
+  # Zapisz zaległe wiersze do bazy wyników
+  if results_store:
+    results_store.close()
+
+  # Zwolnij asocjację (RLRQ) po zakończeniu pętli
+  if session:
+    session.close()
+    print("Session lifetimes (cycles):", str(session.session_lifetimes))
@@ -0,0 +1,142 @@
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reads (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    meter TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    reads_count INTEGER NOT NULL,
+    expected_reads INTEGER NOT NULL,
+    bytes_sent INTEGER NOT NULL,
+    bytes_received INTEGER NOT NULL,
+    connect_ms REAL,
+    rtt_ms REAL,
+    cycle_ms REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS reads_meter_ts ON reads (meter, ts);
+CREATE INDEX IF NOT EXISTS reads_ts ON reads (ts);
+"""
+
+
+class ReadRecord(NamedTuple):
+    ts: float
+    meter: str
+    outcome: str
+    reads_count: int
+    expected_reads: int
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    connect_ms: Optional[float] = None
+    rtt_ms: Optional[float] = None  # Sum of the APDU round trips in the cycle
+    cycle_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ResultsStore:
+    """SQLite (WAL) store with one typed row per meter read cycle.
+
+    Rows are buffered and inserted in one transaction once `batch_size` rows are pending or
+    `flush_interval` seconds have passed since the last commit.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 5) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._pending: List[ReadRecord] = []
+        self._last_flush = time.monotonic()
+
+    def add(self, record: ReadRecord) -> None:
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            with self.connection:
+                self.connection.executemany(
+                    f"INSERT INTO reads ({', '.join(ReadRecord._fields)}) "
+                    f"VALUES ({', '.join('?' * len(ReadRecord._fields))})", self._pending)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    @staticmethod
+    def _range_filter(meter: Optional[str], start: Optional[float], end: Optional[float]):
+        clauses, params = [], []
+        if meter is not None:
+            clauses.append("meter = ?")
+            params.append(meter)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def outcome_counts(self, meter: Optional[str] = None, start: Optional[float] = None,
+                       end: Optional[float] = None) -> dict:
+        """Number of reads per outcome, optionally for one meter and a [start, end) time range."""
+        where, params = self._range_filter(meter, start, end)
+        rows = self.connection.execute(f"SELECT outcome, COUNT(*) FROM reads{where} GROUP BY outcome", params)
+        return dict(rows.fetchall())
+
+    def accuracy(self, meter: Optional[str] = None, start: Optional[float] = None,
+                 end: Optional[float] = None) -> float:
+        """Percentage of successful reads, same definition as the poller's 'Meter reading accuracy'."""
+        counts = self.outcome_counts(meter, start, end)
+        total = sum(counts.values())
+        return (counts.get('successful', 0) / total) * 100 if total else 0.0
+
+    def per_meter(self, start: Optional[float] = None, end: Optional[float] = None) -> List[tuple]:
+        """(meter, reads, successful, accuracy %, average cycle ms) for every meter in the range."""
+        where, params = self._range_filter(None, start, end)
+        rows = self.connection.execute(
+            f"SELECT meter, COUNT(*), SUM(outcome = 'successful'), "
+            f"100.0 * SUM(outcome = 'successful') / COUNT(*), AVG(cycle_ms) "
+            f"FROM reads{where} GROUP BY meter ORDER BY meter", params)
+        return rows.fetchall()
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query meter read results.")
+    parser.add_argument('database')
+    parser.add_argument('command', choices=('summary', 'per-meter'))
+    parser.add_argument('--meter', help="ip:port of the meter (summary only)")
+    parser.add_argument('--from', dest='start', help="start time, e.g. '2026-10-13 02:00'")
+    parser.add_argument('--to', dest='end', help="end time (exclusive)")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.database)
+    start, end = _parse_time(args.start), _parse_time(args.end)
+    if args.command == 'summary':
+        for outcome, count in sorted(store.outcome_counts(args.meter, start, end).items()):
+            print(f"{outcome}: {count}")
+        print(f"Meter reading accuracy: {store.accuracy(args.meter, start, end):.2f}%")
+    else:
+        for meter, reads, successful, percent, cycle_ms in store.per_meter(start, end):
+            cycle = f"{cycle_ms:.1f}ms" if cycle_ms is not None else "-"
+            print(f"{meter}: {reads} reads, {successful} successful, {percent:.2f}%, avg cycle {cycle}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import threading
+import time
+from typing import List, Optional, Tuple
+
+BUCKET_WIDTHS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def _local_offset(timestamp: float) -> int:
+    """Seconds east of UTC at `timestamp`, so hour and day buckets start at local boundaries."""
+    return time.localtime(timestamp).tm_gmtoff
+
+
+class RollingCounter:
+    """Counts events in fixed-width time buckets, keeping only the last `retention` buckets.
+
+    Buckets live in a ring indexed by bucket number modulo `retention`. Each slot remembers which
+    bucket it holds, so a slot left over from an earlier lap of the ring is cleared the first time it
+    is reused or ignored when read: expiry costs O(1) and memory never grows.
+    """
+
+    def __init__(self, width: str = 'day', retention: int = 7) -> None:
+        if width not in BUCKET_WIDTHS:
+            raise ValueError(f"Unknown bucket width {width!r}, expected one of {', '.join(BUCKET_WIDTHS)}")
+        if retention < 1:
+            raise ValueError("retention must be at least one bucket")
+        self.width = width
+        self.seconds = BUCKET_WIDTHS[width]
+        self.retention = retention
+        self._counts = [0] * retention
+        self._bucket_ids = [None] * retention
+        self._lock = threading.Lock()
+
+    def _bucket_id(self, timestamp: float) -> int:
+        return int((timestamp + _local_offset(timestamp)) // self.seconds)
+
+    def _bucket_start(self, bucket_id: int) -> float:
+        start = bucket_id * self.seconds
+        return start - _local_offset(start)
+
+    def add(self, amount: int = 1, timestamp: Optional[float] = None) -> None:
+        bucket_id = self._bucket_id(time.time() if timestamp is None else timestamp)
+        slot = bucket_id % self.retention
+        with self._lock:
+            held = self._bucket_ids[slot]
+            if held != bucket_id:
+                if held is not None and held > bucket_id:
+                    return  # Older than the retention window
+                self._bucket_ids[slot] = bucket_id
+                self._counts[slot] = 0
+            self._counts[slot] += amount
+
+    def _count(self, bucket_id: int) -> int:
+        slot = bucket_id % self.retention
+        return self._counts[slot] if self._bucket_ids[slot] == bucket_id else 0
+
+    def buckets(self, count: Optional[int] = None, now: Optional[float] = None) -> List[Tuple[float, int]]:
+        """(bucket start timestamp, count) for the last `count` buckets up to and including now, oldest first."""
+        count = min(count or self.retention, self.retention)
+        last = self._bucket_id(time.time() if now is None else now)
+        with self._lock:
+            return [(self._bucket_start(bucket_id), self._count(bucket_id))
+                    for bucket_id in range(last - count + 1, last + 1)]
+
+    def total(self, start: Optional[float] = None, end: Optional[float] = None,
+              now: Optional[float] = None) -> int:
+        """Sum of the retained buckets overlapping [start, end); open ends cover the whole window."""
+        last = self._bucket_id(time.time() if now is None else now)
+        first = last - self.retention + 1
+        if start is not None:
+            first = max(first, self._bucket_id(start))
+        if end is not None:
+            end_id = self._bucket_id(end)
+            if self._bucket_start(end_id) >= end:
+                end_id -= 1  # end falls exactly on a bucket boundary
+            last = min(last, end_id)
+        with self._lock:
+            return sum(self._count(bucket_id) for bucket_id in range(first, last + 1))
@@ -1,9 +1,7 @@
 import logging
 import threading
-import time
-from datetime import datetime, timedelta
-from matplotlib import pyplot as plt
 from Serial import SerialCommunicator  # Ensure this is correctly imported based on your project structure
+from scheduler import CATCH_UP_SKIP, TestScheduler
 
 def run_tests():
     """Runs the serial port logging process for testing the modem."""
@@ -16,66 +14,59 @@ def run_tests():
 
 
     # Define a function to periodically call send_radio_change_command
-    def periodic_radio_change():
-        while True:
-            time.sleep(9126)
-            communicator.send_radio_change_command()
-            communicator.monitor_radio_change()
-
-    def periodic_module_change():
-        while True:
-            time.sleep(6521)
-            communicator.send_module_change_command()
-            communicator.monitor_module_change()
-
-    def periodic_ping():
-        while True:
-            time.sleep(300)
-            communicator.send_ping_command()
-            communicator.monitor_ping_calls()
-
-    logging.info("set radio_mode lte\n".encode())
-    def update_uptime_percentage():
-        while True:
-            time.sleep(30)
-            communicator.calculate_uptime_percentage()
+    def radio_change():
+        communicator.send_radio_change_command()
+        communicator.monitor_radio_change()
+
+    def module_change():
+        communicator.send_module_change_command()
+        communicator.monitor_module_change()
+
+    def ping():
+        communicator.send_ping_command()
+        communicator.monitor_ping_calls()
+
+    def plot_results():
+        communicator.plot_daily_module_change_test_results()
+        communicator.plot_daily_radio_test_results()
+        communicator.plot_daily_ping_test_results()
+        communicator.plot_weekly_ping_test_results()
+        communicator.plot_weekly_module_change_test_results()
+        communicator.plot_weekly_radio_change_results()
+
+    def report_scheduler():
+        for line in scheduler.report():
+            logging.info(line)
 
     restart_thread = threading.Thread(target=communicator.monitor_modem_restart, daemon = True)
     restart_thread.start()
 
-    uptime_thread = threading.Thread(target=update_uptime_percentage, daemon= True)
-    uptime_thread.start()
-
-    radio_thread = threading.Thread(target=periodic_radio_change, daemon=True)
-    radio_thread.start()
-
-    module_thread = threading.Thread(target=periodic_module_change, daemon=True)
-    module_thread.start()
-
-    ping_thread = threading.Thread(target=periodic_ping, daemon=True)
-    ping_thread.start()
+    # Tests that write to the modem are exclusive: they run one at a time, in deadline order
+    scheduler = TestScheduler()
+    scheduler.add('radio_change', 9126, radio_change, jitter=120)
+    scheduler.add('module_change', 6521, module_change, jitter=120)
+    scheduler.add('ping', 300, ping, jitter=10)
+    scheduler.add('uptime', 30, communicator.calculate_uptime_percentage, exclusive=False)
+    scheduler.add('plots', 2746, plot_results, exclusive=False, catch_up=CATCH_UP_SKIP)
+    scheduler.add('scheduler_report', 3600, report_scheduler, exclusive=False, catch_up=CATCH_UP_SKIP)
+    if communicator.checkpoint_interval:
+        # A zero interval would make the job run back to back; then the checkpoint is saved only on exit
+        scheduler.add('checkpoint', communicator.checkpoint_interval, communicator.save_checkpoint, exclusive=False,
+                      catch_up=CATCH_UP_SKIP)
 
     try:
-        while True:
-            time.sleep(2746)
-            communicator.plot_daily_module_change_test_results()
-            communicator.plot_daily_radio_test_results()
-            communicator.plot_daily_ping_test_results()
-            communicator.plot_weekly_ping_test_results()
-            communicator.plot_weekly_module_change_test_results()
-            communicator.plot_weekly_radio_change_results()
-            time.sleep(1)  # Delay to prevent CPU overuse
+        scheduler.run()
 
     except KeyboardInterrupt:
         # Log the user interrupt and gracefully stop all monitoring
         logging.info("Test logging interrupted by user.")
 
     finally:
+        scheduler.stop()
+        report_scheduler()
         # Ensure that the communicator stops reading
-        if communicator.ser:
-            communicator.ser.close()  # Close the serial connection
+        communicator.close()  # Stop the reader thread and close the serial connection
 
 
 if __name__ == "__main__":
-    run_tests()
-    plt.show()
\ No newline at end of file
+    run_tests()
\ No newline at end of file
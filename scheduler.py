@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+
+from latency import LogLinearHistogram
+
+# What to do when a job's next deadline has already passed, e.g. after waiting for the modem
+CATCH_UP_ONCE = 'once'  # Run one make-up run right away, drop the other missed runs
+CATCH_UP_SKIP = 'skip'  # Drop every missed run and wait for the next slot
+
+
+class Job:
+    def __init__(self, name: str, interval: float, func: Callable[[], None], exclusive: bool = True,
+                 jitter: float = 0, catch_up: str = CATCH_UP_ONCE, start_delay: Optional[float] = None) -> None:
+        if catch_up not in (CATCH_UP_ONCE, CATCH_UP_SKIP):
+            raise ValueError(f"Unknown catch-up policy {catch_up!r}")
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.exclusive = exclusive
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.start_delay = interval if start_delay is None else start_delay
+        self.slot = 0.0  # Current deadline before jitter; slots advance by `interval`
+        self.deadline = 0.0
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.lag = LogLinearHistogram()  # Time from the deadline until the job actually started
+
+
+class TestScheduler:
+    """Runs periodic jobs at their deadlines from a single priority queue.
+
+    Jobs marked exclusive need the modem to themselves; they are handed to one modem thread in
+    deadline order, so a radio change reset can never interleave with a ping or a module change.
+    Other jobs run directly on the scheduler thread and must be short. A job is rescheduled only
+    after it finishes, so a slow job is never queued twice.
+    """
+
+    def __init__(self) -> None:
+        self.jobs: List[Job] = []
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._modem_jobs: queue.Queue = queue.Queue()
+        self._modem_thread = threading.Thread(target=self._run_modem_jobs, name="ModemJobs", daemon=True)
+        self._stopped = False
+
+    def add(self, name: str, interval: float, func: Callable[[], None], **options) -> Job:
+        job = Job(name, interval, func, **options)
+        job.slot = time.monotonic() + job.start_delay
+        self.jobs.append(job)
+        self._push(job)
+        return job
+
+    def _push(self, job: Job) -> None:
+        job.deadline = job.slot + random.uniform(0, job.jitter)
+        with self._condition:
+            heapq.heappush(self._heap, (job.deadline, next(self._sequence), job))
+            self._condition.notify()
+
+    def _reschedule(self, job: Job, now: float) -> None:
+        job.slot += job.interval
+        if job.slot <= now:
+            missed = int((now - job.slot) // job.interval) + 1
+            if job.catch_up == CATCH_UP_ONCE:
+                job.skipped += missed - 1
+                job.slot = now
+            else:
+                job.skipped += missed
+                job.slot += missed * job.interval
+        self._push(job)
+
+    def _next_due(self) -> Optional[Job]:
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                wait = self._heap[0][0] - time.monotonic()
+                if wait <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._condition.wait(wait)
+        return None
+
+    def _execute(self, job: Job) -> None:
+        job.lag.record(time.monotonic() - job.deadline)
+        try:
+            job.func()
+        except Exception as e:
+            job.failures += 1
+            logging.error(f"Scheduled job {job.name} failed: {e}")
+        job.runs += 1
+        if not self._stopped:
+            self._reschedule(job, time.monotonic())
+
+    def _run_modem_jobs(self) -> None:
+        while True:
+            job = self._modem_jobs.get()
+            if job is None:
+                break
+            self._execute(job)
+
+    def run(self) -> None:
+        """Dispatches jobs until stop() is called; blocks the calling thread."""
+        self._modem_thread.start()
+        while True:
+            job = self._next_due()
+            if job is None:
+                break
+            if job.exclusive:
+                self._modem_jobs.put(job)
+            else:
+                self._execute(job)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._modem_jobs.put(None)
+
+    def report(self) -> List[str]:
+        """One line per job with run counts and how late it started (queue lag)."""
+        lines = []
+        for job in self.jobs:
+            lines.append(f"Scheduler {job.name}: runs={job.runs} skipped={job.skipped} failures={job.failures} "
+                         f"lag p50={job.lag.percentile(50):.1f}s p99={job.lag.percentile(99):.1f}s "
+                         f"max={job.lag.max / 1_000_000:.1f}s")
+        return lines
@@ -0,0 +1,253 @@
+import codecs
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Collection, List, Optional, Tuple
+
+import serial
+
+from stream_matcher import StreamMatch, StreamMatcher
+
+
+class ByteRingBuffer:
+    """Fixed-capacity FIFO of bytes backed by a single preallocated bytearray.
+
+    Writers fill the contiguous free region returned by writable() (e.g. with readinto) and
+    commit() it; readers take the contiguous region from readable() and consume() it. Buffered
+    bytes are never overwritten: writable() offers only free space, so a writer facing a full
+    buffer has to drain it first, and memory never grows past the capacity.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024) -> None:
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def writable(self, size: int) -> memoryview:
+        """Returns up to `size` bytes of contiguous free space; empty when the buffer is full."""
+        size = min(size, self.free)
+        end = (self._start + self._size) % self.capacity
+        return self._view[end:min(end + size, self.capacity)]
+
+    def commit(self, size: int) -> None:
+        self._size += size
+
+    def readable(self) -> memoryview:
+        """Returns the oldest contiguous run of buffered bytes without copying."""
+        return self._view[self._start:min(self._start + self._size, self.capacity)]
+
+    def consume(self, size: int) -> None:
+        size = min(size, self._size)
+        self._start = (self._start + size) % self.capacity
+        self._size -= size
+        if self._size == 0:
+            self._start = 0
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
+
+
+class Subscription:
+    """Bounded queue of chunks received by a SerialReader."""
+
+    def __init__(self, reader: 'SerialReader', maxsize: int) -> None:
+        self.reader = reader
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped_chunks = 0
+
+    def put(self, data: str) -> None:
+        """Queues a chunk, dropping the oldest one if the subscriber is falling behind."""
+        while True:
+            try:
+                self.queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_chunks += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> str:
+        """Returns the next chunk, or an empty string if nothing arrived within the timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+
+    def wait_for(self, predicate: Callable[[str], bool], timeout: float) -> Tuple[bool, str]:
+        """Blocks until predicate(buffer) holds for the data received so far, or the deadline passes.
+
+        Sleeps on the queue's condition variable, so it wakes as soon as a chunk is published.
+        Returns whether the predicate matched and the accumulated buffer.
+        """
+        deadline = time.monotonic() + timeout
+        buffer = ""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False, buffer
+            data = self.get(timeout=remaining)
+            if data:
+                buffer += data
+                if predicate(buffer):
+                    return True, buffer
+
+    def wait_for_match(self, matcher: StreamMatcher, timeout: float,
+                       names: Optional[Collection[str]] = None) -> Optional[StreamMatch]:
+        """Feeds each received chunk to the matcher once and returns its first match, or None on timeout.
+
+        When names is given, matches of other patterns only fire their callbacks.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            data = self.get(timeout=remaining)
+            if data:
+                for match in matcher.feed(data):
+                    if names is None or match.name in names:
+                        return match
+
+    def drain(self) -> str:
+        """Returns all chunks queued so far without blocking."""
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.queue.get_nowait())
+            except queue.Empty:
+                return "".join(chunks)
+
+    def close(self) -> None:
+        self.reader.unsubscribe(self)
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class SerialReader(threading.Thread):
+    """Owns the serial port and publishes every received chunk to all subscribers."""
+
+    def __init__(self, port: str, baudrate: int, timeout: float,
+                 on_data: Optional[Callable[[str], None]] = None,
+                 queue_size: int = 1024, reconnect_delay: float = 1, buffer_size: int = 64 * 1024) -> None:
+        super().__init__(name=f"SerialReader-{port}", daemon=True)
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.on_data = on_data
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+
+        self.ser = None
+        self._ring = ByteRingBuffer(buffer_size)
+        # Carries multi-byte characters split across reads over to the next chunk
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._subscribers: List[Subscription] = []
+        self._subscribers_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def connect(self) -> bool:
+        """Attempts to connect to the serial port."""
+        self._ring.clear()
+        self._decoder.reset()
+        try:
+            self.ser = serial.Serial(self.port, baudrate=self.baudrate, timeout=self.timeout)
+            logging.info(f"Connected to {self.port}")
+            return True
+        except serial.SerialException as e:
+            logging.error(f"Failed to connect to {self.port}: {e}")
+            self.ser = None
+            return False
+
+    def subscribe(self, maxsize: Optional[int] = None) -> Subscription:
+        subscription = Subscription(self, maxsize or self.queue_size)
+        with self._subscribers_lock:
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._subscribers_lock:
+            self._subscribers = [s for s in self._subscribers if s is not subscription]
+
+    def _publish(self, data: str) -> None:
+        if self.on_data:
+            self.on_data(data)
+        # The list is replaced on (un)subscribe, so iterating a snapshot needs no lock
+        for subscription in self._subscribers:
+            subscription.put(data)
+
+    def _close_port(self) -> None:
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except serial.SerialException:
+                pass
+            self.ser = None
+
+    def run(self) -> None:
+        while not self._stop_event.is_set():
+            if self.ser is None and not self.connect():
+                self._stop_event.wait(self.reconnect_delay)
+                continue
+
+            try:
+                # Blocks for up to `timeout` waiting for the first byte, then takes everything buffered
+                received = self._read(self.ser.in_waiting or 1)
+                # The rest of a burst arrives with its first byte; publish them together as one chunk
+                while received:
+                    waiting = self.ser.in_waiting
+                    if not waiting:
+                        break
+                    received = self._read(waiting)
+            except (serial.SerialException, OSError, TypeError, AttributeError) as e:
+                if self._stop_event.is_set():
+                    break
+                logging.error(f"Disconnected from {self.port}: {e}")
+                logging.info(f"Attempting to reconnect to {self.port}...")
+                self._close_port()
+                continue
+
+            if len(self._ring):
+                self._publish_buffered()
+
+    def _read(self, size: int) -> int:
+        """Reads up to `size` bytes into the ring, publishing what it holds first if they would not fit."""
+        if size > self._ring.free:
+            # Long bursts go out in ring-sized chunks; unpublished bytes are never overwritten
+            self._publish_buffered()
+        view = self._ring.writable(size)
+        received = self.ser.readinto(view)
+        view.release()
+        self._ring.commit(received)
+        return received
+
+    def _publish_buffered(self) -> None:
+        while len(self._ring):
+            chunk = self._ring.readable()
+            text = self._decoder.decode(chunk)
+            self._ring.consume(len(chunk))
+            chunk.release()
+            if text:
+                self._publish(text)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._close_port()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=self.timeout + 1)
@@ -0,0 +1,75 @@
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class StreamMatch(NamedTuple):
+    name: str
+    text: str
+    groups: Tuple[Optional[str], ...]
+
+
+class StreamMatcher:
+    """Incremental multi-pattern matcher over a chunked text stream.
+
+    All registered patterns are compiled into one alternation, every chunk is scanned once, and
+    only a tail shorter than the longest possible match is carried over to the next chunk, so a
+    pattern split across two reads is still found while memory stays bounded.
+    """
+
+    def __init__(self) -> None:
+        self._patterns: List[Tuple[str, str, int, Optional[Callable[[StreamMatch], None]]]] = []
+        self._regex = None
+        self._groups_by_outer: Dict[int, Tuple[int, range]] = {}
+        self._max_length = 1
+        self._tail = ""
+
+    def register(self, name: str, pattern: str, callback: Optional[Callable[[StreamMatch], None]] = None,
+                 regex: bool = False, max_length: int = 256) -> 'StreamMatcher':
+        """Adds a literal (or, with regex=True, a regular expression) pattern.
+
+        max_length bounds how long a regex match can be; literal patterns use their own length.
+        """
+        source = pattern if regex else re.escape(pattern)
+        length = max_length if regex else len(pattern)
+        self._patterns.append((name, source, length, callback))
+        self._regex = None
+        return self
+
+    def _compile(self) -> None:
+        sources = [f"(?P<_p{i}>{source})" for i, (_, source, _, _) in enumerate(self._patterns)]
+        self._regex = re.compile("|".join(sources))
+        outer = [self._regex.groupindex[f"_p{i}"] for i in range(len(self._patterns))]
+        # Map each alternative's outer group to (pattern index, its own capture groups)
+        bounds = outer[1:] + [self._regex.groups + 1]
+        self._groups_by_outer = {start: (i, range(start + 1, end))
+                                 for i, (start, end) in enumerate(zip(outer, bounds))}
+        self._max_length = max(length for _, _, length, _ in self._patterns)
+
+    def feed(self, data: str) -> List[StreamMatch]:
+        """Scans a new chunk and fires callbacks for every match, in stream order."""
+        if not self._patterns:
+            return []
+        if self._regex is None:
+            self._compile()
+
+        buffer = self._tail + data
+        matches = []
+        scanned_to = 0
+        for m in self._regex.finditer(buffer):
+            # The outer group of the matching alternative closes last, so lastindex identifies it
+            index, inner_groups = self._groups_by_outer[m.lastindex]
+            name, _, _, callback = self._patterns[index]
+            match = StreamMatch(name, m.group(0), tuple(m.group(g) for g in inner_groups))
+            matches.append(match)
+            if callback:
+                callback(match)
+            scanned_to = m.end()
+
+        # Anything older than the longest pattern can no longer start a match
+        keep_from = max(scanned_to, len(buffer) - self._max_length + 1)
+        self._tail = buffer[keep_from:]
+        return matches
+
+    def reset(self) -> None:
+        """Forgets the carried-over tail, e.g. when the stream is reconnected."""
+        self._tail = ""
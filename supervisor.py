@@ -0,0 +1,250 @@
+import argparse
+import heapq
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from typing import IO, Dict, List, Optional, Sequence, Tuple
+
+from log_writer import LogWriter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # CPU and RSS are read from /proc instead, where there is one
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_usage(pid: int) -> Optional[Tuple[float, int]]:
+    """(CPU seconds used so far, resident set size in bytes) of a process, or None if unknown."""
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces, so the fields are counted from its closing ')'
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, resident_pages * _PAGE_SIZE
+
+
+class Child:
+    """One supervised program: its command, output log, restart backoff and resource usage."""
+
+    def __init__(self, name: str, args: Sequence[str], log_dir: str, backoff_initial: float = 1,
+                 backoff_max: float = 300, stable_after: float = 60, max_bytes: int = 10 * 1024 * 1024) -> None:
+        self.name = name
+        self.args = list(args)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after  # A run this long resets the backoff
+        self.output = LogWriter(os.path.join(log_dir, f"{name}_output.txt"), max_bytes=max_bytes)
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.starts = 0
+        self.failures = 0  # Consecutive crashes, for the backoff
+        self.last_exit: Optional[int] = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.peak_rss = 0
+        self._last_sample: Optional[Tuple[float, float]] = None  # (monotonic time, CPU seconds)
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None
+
+    def restart_delay(self) -> float:
+        return min(self.backoff_max, self.backoff_initial * 2 ** max(0, self.failures - 1))
+
+    def sample(self) -> None:
+        """Updates the CPU percentage since the previous sample and the RSS."""
+        if self.process is None:
+            return
+        usage = process_usage(self.process.pid)
+        if usage is None:
+            return
+        cpu_seconds, self.rss = usage
+        self.peak_rss = max(self.peak_rss, self.rss)
+        now = time.monotonic()
+        if self._last_sample is not None and now > self._last_sample[0]:
+            self.cpu_percent = (cpu_seconds - self._last_sample[1]) / (now - self._last_sample[0]) * 100
+        self._last_sample = (now, cpu_seconds)
+
+    def status(self) -> str:
+        state = f"pid {self.process.pid}" if self.process else f"stopped (last exit {self.last_exit})"
+        return (f"{self.name}: {state}, starts {self.starts}, CPU {self.cpu_percent:.1f}%, "
+                f"RSS {self.rss / 1024 / 1024:.1f} MB (peak {self.peak_rss / 1024 / 1024:.1f} MB)")
+
+
+class Supervisor:
+    """Runs child programs, streams their output to rotating logs and restarts the ones that crash.
+
+    Every pipe has a thread that drains it line by line into the child's LogWriter, so a chatty
+    child can never fill its pipe and block. A waiter thread per child blocks in wait() and reports
+    the exit on a queue; the main loop sleeps on that queue until an exit, a due restart or the
+    next resource sample, instead of polling. Crashes are restarted after 1, 2, 4 ... seconds
+    (up to `backoff_max`); a clean exit (code 0) is not restarted.
+    """
+
+    def __init__(self, log_dir: str = 'logs', sample_interval: float = 10, report_interval: float = 600) -> None:
+        self.log_dir = log_dir
+        os.makedirs(log_dir, exist_ok=True)
+        self.sample_interval = sample_interval
+        self.report_interval = report_interval
+        self.children: Dict[str, Child] = {}
+        self._exits: queue.Queue = queue.Queue()
+        self._restarts: List[Tuple[float, str]] = []
+        self._stopped = threading.Event()
+
+    def add(self, name: str, args: Sequence[str], **options) -> Child:
+        child = Child(name, args, self.log_dir, **options)
+        self.children[name] = child
+        return child
+
+    def _drain(self, child: Child, pipe: IO[bytes], prefix: str) -> None:
+        with pipe:
+            for line in iter(pipe.readline, b''):
+                child.output.write(prefix + line.decode('utf-8', errors='replace').rstrip('\r\n'))
+
+    def _wait(self, child: Child, process: subprocess.Popen) -> None:
+        self._exits.put((child.name, process, process.wait()))
+
+    def start(self, child: Child) -> None:
+        # Children are Python scripts; unbuffered output reaches the log as it is printed
+        environment = dict(os.environ, PYTHONUNBUFFERED='1')
+        try:
+            process = subprocess.Popen(child.args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environment)
+        except OSError as e:
+            logging.error(f"Could not start {child.name}: {e}")
+            child.failures += 1
+            self._schedule_restart(child)
+            return
+        child.process = process
+        child.started_at = time.monotonic()
+        child.starts += 1
+        child._last_sample = None
+        if not child.output.is_alive():
+            child.output.start()
+        child.output.write(f"Supervisor: started {' '.join(child.args)} as pid {process.pid}")
+        logging.info(f"Started {child.name} (pid {process.pid})")
+        for pipe, prefix in ((process.stdout, ""), (process.stderr, "stderr: ")):
+            threading.Thread(target=self._drain, args=(child, pipe, prefix), name=f"{child.name}-drain",
+                             daemon=True).start()
+        threading.Thread(target=self._wait, args=(child, process), name=f"{child.name}-wait", daemon=True).start()
+
+    def _schedule_restart(self, child: Child) -> None:
+        delay = child.restart_delay()
+        logging.warning(f"Restarting {child.name} in {delay:.0f} s")
+        heapq.heappush(self._restarts, (time.monotonic() + delay, child.name))
+
+    def _on_exit(self, name: str, process: subprocess.Popen, returncode: int) -> None:
+        child = self.children[name]
+        if child.process is not process:
+            return
+        child.process = None
+        child.last_exit = returncode
+        ran = time.monotonic() - child.started_at
+        child.output.write(f"Supervisor: exited with code {returncode} after {ran:.0f} s")
+        if self._stopped.is_set():
+            return
+        if returncode == 0:
+            logging.info(f"{name} finished")
+            return
+        child.failures = 1 if ran >= child.stable_after else child.failures + 1
+        logging.error(f"{name} exited with code {returncode} after {ran:.0f} s")
+        self._schedule_restart(child)
+
+    def _sample(self) -> None:
+        for child in self.children.values():
+            child.sample()
+
+    def report(self) -> List[str]:
+        return [child.status() for child in self.children.values()]
+
+    def run(self) -> None:
+        """Starts every child and supervises until stop() is called or all have finished cleanly."""
+        for child in self.children.values():
+            self.start(child)
+        next_sample = time.monotonic() + self.sample_interval
+        next_report = time.monotonic() + self.report_interval
+        while not self._stopped.is_set():
+            if not self._restarts and not any(child.running for child in self.children.values()):
+                logging.info("All children have finished")
+                break
+            now = time.monotonic()
+            deadline = min([next_sample] + [due for due, _ in self._restarts[:1]])
+            try:
+                self._on_exit(*self._exits.get(timeout=max(0.0, deadline - now)))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            while self._restarts and self._restarts[0][0] <= now and not self._stopped.is_set():
+                _, name = heapq.heappop(self._restarts)
+                self.start(self.children[name])
+            if now >= next_sample:
+                self._sample()
+                next_sample = now + self.sample_interval
+            if now >= next_report:
+                for line in self.report():
+                    logging.info(line)
+                next_report = now + self.report_interval
+
+    def stop(self, timeout: float = 10) -> None:
+        """Terminates the children (killing those that do not exit within `timeout`) and closes their logs."""
+        self._stopped.set()
+        self._restarts = []
+        running = [child.process for child in self.children.values() if child.process is not None]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        # Let the waiter threads report the exits, then write them to the logs
+        while any(child.running for child in self.children.values()):
+            try:
+                self._on_exit(*self._exits.get(timeout=1))
+            except queue.Empty:
+                break
+        for child in self.children.values():
+            child.output.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Python scripts, capture their output and restart them on crashes.")
+    parser.add_argument('scripts', nargs='+')
+    parser.add_argument('--log-dir', default='logs', help="where <script>_output.txt logs are written")
+    parser.add_argument('--sample-interval', type=float, default=10, help="seconds between CPU/RSS samples")
+    args = parser.parse_args()
+
+    supervisor = Supervisor(args.log_dir, args.sample_interval)
+    for script in args.scripts:
+        supervisor.add(os.path.splitext(os.path.basename(script))[0], [sys.executable, script])
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        logging.info("Supervisor stopped by user.")
+    finally:
+        supervisor.stop()
+        for line in supervisor.report():
+            logging.info(line)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()